@@ -1,6 +1,17 @@
-from .lltiler import LLTiler, AllTileSelector, ChunkTileSelector, render_tile
+from .lltiler import (LLTiler, AllTileSelector, ChunkTileSelector, BlockTileSelector,
+                      CostTileSelector, CoverageCost,
+                      render_tile, render_tiles, tile_bbox, quadtree_tiles)
+from .rectilinear import RectilinearGrid
+from .colormap import ColormapLUT
+from .footprint import PolygonFootprint, MaskFootprint
+from .taskqueue import QueueTileSelector
+from .encoding import TileEncoder
 
-__all__ = ['LLTiler', 'AllTileSelector', 'ChunkTileSelector', 'render_tile']
+__all__ = ['LLTiler', 'AllTileSelector', 'ChunkTileSelector', 'BlockTileSelector',
+           'CostTileSelector', 'CoverageCost',
+           'render_tile', 'render_tiles', 'tile_bbox', 'quadtree_tiles',
+           'RectilinearGrid', 'ColormapLUT', 'PolygonFootprint', 'MaskFootprint',
+           'QueueTileSelector', 'TileEncoder']
 
 from ._version import get_versions
 __version__ = get_versions()['version']
@@ -0,0 +1,81 @@
+import numpy as np
+
+
+def _get_cmap(name):
+    try:
+        from matplotlib import colormaps
+    except ImportError:
+        from matplotlib.cm import get_cmap
+        return get_cmap(name)
+    return colormaps[name]
+
+
+def _colortable(cmap, size):
+    if isinstance(cmap, str):
+        cmap = _get_cmap(cmap)
+    if callable(cmap):
+        return np.asarray(cmap((np.arange(size) + .5) / size, bytes=True),
+                          dtype="uint8")
+    colors = np.asarray(cmap)
+    if colors.ndim != 2 or colors.shape[1] != 4:
+        raise ValueError("colors must be given as array of shape (N, 4)")
+    if colors.dtype.kind == "f":
+        colors = np.round(np.clip(colors, 0., 1.) * 255)
+    colors = colors.astype("uint8")
+    return colors[(np.arange(size) * len(colors)) // size]
+
+
+class ColormapLUT:
+    def __init__(self, cmap, vmin=0., vmax=1., size=256, bad=(0, 0, 0, 0)):
+        """
+        Maps scalar fields to RGBA tiles using a precomputed color table.
+
+        :param cmap: matplotlib colormap, name of a matplotlib colormap or
+                     array of N RGBA colors (uint8 or float in 0...1)
+        :param vmin: value mapped to the first color
+        :param vmax: value mapped to the last color
+        :param size: number of entries in the color table (e.g. 256 or 4096)
+        :param bad: RGBA color used for NaN and invalid values
+
+        :note: matplotlib is only required if `cmap` is given by name
+        """
+        if vmax == vmin:
+            raise ValueError("vmin and vmax must differ")
+        self.vmin = vmin
+        self.vmax = vmax
+        self.size = size
+        table = np.empty((size + 1, 4), dtype="uint8")
+        table[:size] = _colortable(cmap, size)
+        table[size] = bad
+        self.table = table
+
+    def indices(self, values, valid=None):
+        """
+        computes color table indices for the given values
+
+        :param values: array of scalar values
+        :param valid: optional boolean array, invalid values are mapped
+                      to the `bad` color
+        """
+        scaled = np.subtract(values, self.vmin, dtype="float")
+        scaled *= self.size / (self.vmax - self.vmin)
+        np.clip(scaled, 0, self.size - 1, out=scaled)
+        bad = np.isnan(scaled)
+        if valid is not None:
+            bad |= ~np.asarray(valid, dtype="bool")
+        scaled[bad] = self.size
+        return scaled.astype(np.intp)
+
+    def __call__(self, values, valid=None, out=None):
+        """
+        maps values to RGBA colors
+
+        :param values: array of scalar values
+        :param valid: optional boolean array, invalid values are mapped
+                      to the `bad` color
+        :param out: optional preallocated uint8 array of shape
+                    values.shape + (4,)
+        :returns: RGBA values of shape values.shape + (4,)
+        """
+        return np.take(self.table, self.indices(values, valid),
+                       axis=0, out=out)
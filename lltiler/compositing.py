@@ -0,0 +1,73 @@
+import numpy as np
+from PIL import Image
+
+from .downsample import as_rgba
+
+
+def load_layer(layer):
+    """
+    decodes a layer given as file name, PIL image or RGBA array
+    """
+    if isinstance(layer, str):
+        layer = Image.open(layer)
+    return as_rgba(layer)
+
+
+def composite(layers):
+    """
+    paints layers on top of each other (Porter-Duff "over")
+
+    Layers are processed from top to bottom, as soon as all pixels are
+    opaque, the remaining layers are neither decoded nor composited.
+
+    :param layers: sequence of layers from bottom to top, each given as file
+                   name, PIL image or RGBA array
+    :returns: RGBA array
+    """
+    layers = iter(layers[::-1])
+    for layer in layers:
+        top = load_layer(layer)
+        if top[..., 3].max() > 0:
+            break
+    if top[..., 3].min() == 255:
+        return top
+    # colors are accumulated premultiplied with their alpha
+    coverage = top[..., 3:] * np.float32(1. / 255.)
+    color = top[..., :3] * coverage
+    opaque = top[..., 3] == 255
+    blended = False
+    for layer in layers:
+        tile = load_layer(layer)
+        alpha = tile[..., 3]
+        if alpha.max() == 0:
+            continue
+        visible = tile[..., 3:] * np.float32(1. / 255.)
+        visible *= 1. - coverage
+        color += tile[..., :3] * visible
+        coverage += visible
+        blended = True
+        opaque |= alpha == 255
+        if opaque.all():
+            break
+    if not blended:
+        return top
+    color /= np.maximum(coverage, np.float32(1. / 512.))
+    color += .5
+    np.minimum(color, 255., out=color)
+    out = np.empty(color.shape[:2] + (4,), dtype="uint8")
+    out[..., :3] = color
+    out[..., 3:] = coverage * 255. + .5
+    return out
+
+
+def overlay(images):
+    """
+    paints tiles on top of each other (see `composite`)
+
+    :param images: tiles from bottom to top, given as PIL images, RGBA
+                   arrays or file names, which are only decoded if needed
+    :returns: PIL image
+    """
+    if len(images) == 1 and isinstance(images[0], Image.Image):
+        return images[0]
+    return Image.fromarray(composite(images))
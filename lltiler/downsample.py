@@ -0,0 +1,163 @@
+import numpy as np
+from PIL import Image
+
+from .encoding import _color_keys
+
+RESAMPLING = ("box", "lanczos", "mode", "nearest")
+
+
+def as_rgba(tile):
+    """
+    converts a PIL image or array into an RGBA array
+    """
+    if isinstance(tile, Image.Image) and tile.mode != "RGBA":
+        tile = tile.convert("RGBA")
+    return np.asarray(tile)
+
+
+def _pair_sum(values):
+    values = values[0::2] + values[1::2]
+    return values[:, 0::2] + values[:, 1::2]
+
+
+def _box(tile):
+    # area average of premultiplied colors, such that transparent pixels
+    # do not darken the edges of opaque areas
+    alpha = tile[..., 3]
+    if alpha.min() == 255:
+        return ((_pair_sum(tile.astype("uint16")) + 2) >> 2).astype("uint8")
+    if alpha.max() == 0:
+        return np.zeros((tile.shape[0] // 2, tile.shape[1] // 2, 4), dtype="uint8")
+    alpha = tile[..., 3:].astype("uint16")
+    premultiplied = _pair_sum(tile[..., :3] * alpha.astype("float32"))
+    alpha = _pair_sum(alpha)
+    premultiplied *= 1. / np.maximum(alpha, 1).astype("float32")
+    premultiplied += .5
+    out = np.empty(alpha.shape[:2] + (4,), dtype="uint8")
+    out[..., :3] = premultiplied
+    out[..., 3:] = (alpha + 2) >> 2
+    return out
+
+
+def _mode(tile):
+    # most frequent color of each 2x2 block, ties are resolved in favour of
+    # the top left pixel
+    keys = _color_keys(tile)
+    blocks = [keys[0::2, 0::2], keys[0::2, 1::2], keys[1::2, 0::2], keys[1::2, 1::2]]
+    equal = {(i, j): blocks[i] == blocks[j] for i in range(4) for j in range(i + 1, 4)}
+    mode = blocks[0]
+    best = equal[(0, 1)].astype("uint8") + equal[(0, 2)] + equal[(0, 3)]
+    for i in range(1, 4):
+        count = sum(equal[tuple(sorted((i, j)))].astype("uint8") for j in range(4) if j != i)
+        better = count > best
+        mode = np.where(better, blocks[i], mode)
+        best = np.maximum(best, count)
+    return mode.view("uint8").reshape(mode.shape + (4,))
+
+
+def _nearest(tile):
+    return tile[::2, ::2].copy()
+
+
+REDUCERS = {"box": _box, "mode": _mode, "nearest": _nearest}
+
+
+def _lanczos(canvas):
+    # PIL's resampling is considerably faster than a vectorized separable
+    # filter, the conversion to "RGBa" premultiplies the colors
+    image = Image.fromarray(canvas).convert("RGBa")
+    image = image.resize((canvas.shape[1] // 2, canvas.shape[0] // 2), Image.LANCZOS)
+    return np.asarray(image.convert("RGBA"))
+
+
+def reduce_tile(tile, resampling="box"):
+    """
+    reduces a single tile to half of its resolution
+
+    :param tile: RGBA array or PIL image
+    :param resampling: "box", "mode" or "nearest" (see `downsample`)
+    :returns: RGBA array
+    """
+    return REDUCERS[resampling](as_rgba(tile))
+
+
+def downsample(children, resampling="box", tilesize=256):
+    """
+    combines four adjacent tiles into a tile of half resolution
+
+    Colors are averaged weighted by their alpha values (premultiplied
+    alpha), such that transparent pixels do not darken edges.
+
+    :param children: top left, bottom left, top right and bottom right
+                     tiles as RGBA arrays or PIL images, missing tiles are
+                     None and considered transparent
+    :param resampling: "box" (average of 2x2 pixels), "lanczos" (Lanczos
+                       filter with 3 lobes), "mode" (most frequent color
+                       of 2x2 pixels, for categorical data) or "nearest"
+                       (top left pixel of 2x2 pixels)
+    :param tilesize: size of the tiles, used if all children are missing
+    :returns: RGBA array
+    """
+    if resampling not in RESAMPLING:
+        raise ValueError("resampling must be one of {}".format(", ".join(RESAMPLING)))
+    children = [None if child is None else as_rgba(child) for child in children]
+    size = next((len(child) for child in children if child is not None), tilesize)
+    half = size // 2
+    if resampling == "lanczos":
+        canvas = np.zeros((2 * size, 2 * size, 4), dtype="uint8")
+    else:
+        out = np.zeros((size, size, 4), dtype="uint8")
+    for (sx, sy), child in zip([(0, 0), (0, 1), (1, 0), (1, 1)], children):
+        if child is None:
+            continue
+        if resampling == "lanczos":
+            canvas[sy * size:(sy + 1) * size, sx * size:(sx + 1) * size] = child
+        else:
+            out[sy * half:(sy + 1) * half, sx * half:(sx + 1) * half] = REDUCERS[resampling](child)
+    if resampling == "lanczos":
+        return _lanczos(canvas)
+    return out
+
+
+def combine(tl, bl, tr, br, resampling="box", tilesize=256):
+    """
+    combines four adjacent tiles (PIL images, RGBA arrays or None for
+    missing tiles) into a tile of half resolution (see `downsample`)
+
+    :returns: PIL image
+    """
+    return Image.fromarray(downsample([tl, bl, tr, br], resampling, tilesize))
+
+
+def reduce_block(block, levels, resampling="box", present=None, tilesize=256):
+    """
+    builds all coarser levels of a block of 2**levels x 2**levels tiles
+
+    The block is reduced level by level in memory, each level is an array
+    covering the whole block at half the resolution of the previous level.
+
+    :param block: RGBA array of shape (2**levels * tilesize,
+                  2**levels * tilesize, 4), rows correspond to y
+    :param levels: number of levels to generate
+    :param resampling: downsampling filter (see `downsample`)
+    :param present: optional function (x, y, depth) returning False for
+                    tiles of the block (indices relative to the block, after
+                    `depth` reductions) which do not need to be generated,
+                    these remain transparent
+    :param tilesize: size of the tiles
+    :returns: generator of (depth, array) for depth = 1 ... levels
+    """
+    for depth in range(1, levels + 1):
+        n = 2 ** (levels - depth)
+        reduced = np.zeros((n * tilesize, n * tilesize, 4), dtype="uint8")
+        for x in range(n):
+            for y in range(n):
+                if present is not None and not present(x, y, depth):
+                    continue
+                children = [block[(2 * y + sy) * tilesize:(2 * y + sy + 1) * tilesize,
+                                  (2 * x + sx) * tilesize:(2 * x + sx + 1) * tilesize]
+                            for sx, sy in [(0, 0), (0, 1), (1, 0), (1, 1)]]
+                reduced[y * tilesize:(y + 1) * tilesize,
+                        x * tilesize:(x + 1) * tilesize] = downsample(children, resampling, tilesize)
+        yield depth, reduced
+        block = reduced
@@ -0,0 +1,200 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+PRESETS = {
+    "default": {"PNG": {}, "WEBP": {"lossless": True}},
+    "fast": {"PNG": {"compress_level": 1}, "WEBP": {"lossless": True, "method": 0}},
+    "small": {"PNG": {"optimize": True}, "WEBP": {"lossless": True, "method": 6, "quality": 100}},
+    "lossy": {"PNG": {}, "WEBP": {"lossless": False, "quality": 80, "method": 4}},
+}
+
+FASTOCTREE = 2
+
+PALETTE_MODES = ("auto", "quantize")
+
+
+def image_format(filename):
+    """
+    determines the PIL image format from the extension of `filename`
+    """
+    Image.init()
+    ext = os.path.splitext(filename)[1].lower()
+    try:
+        return Image.registered_extensions()[ext]
+    except KeyError:
+        raise ValueError("unknown image format for {!r}".format(filename))
+
+
+def _color_keys(rgba):
+    """
+    packs RGBA pixels (uint8, last axis of length 4) into uint32 keys
+    """
+    rgba = np.ascontiguousarray(rgba, dtype="uint8")
+    return rgba.view("uint32").reshape(rgba.shape[:-1])
+
+
+def palette_colors(colors):
+    """
+    converts a fixed palette into sorted, unique color keys
+
+    :param colors: `ColormapLUT` or array of RGBA colors of shape (N, 4)
+    """
+    colors = np.asarray(getattr(colors, "table", colors))
+    if colors.ndim != 2 or colors.shape[1] != 4:
+        raise ValueError("palette colors must be given as array of shape (N, 4)")
+    keys = np.unique(_color_keys(colors.astype("uint8")))
+    if len(keys) > 256:
+        raise ValueError("a palette can have at most 256 colors, got {}".format(len(keys)))
+    return keys
+
+
+def palette_indices(rgba, keys=None, max_colors=256):
+    """
+    indexes the colors of an RGBA tile without loss
+
+    :param rgba: uint8 array of shape (height, width, 4)
+    :param keys: sorted color keys of a fixed palette (see `palette_colors`),
+                 if None, the palette is built from the colors of the tile
+    :param max_colors: maximum size of a palette built from the tile
+    :returns: tuple (indices, colors) of uint8 arrays of shapes
+              (height, width) and (N, 4), or None if the tile can not be
+              represented using the palette
+    """
+    pixels = _color_keys(rgba).ravel()
+    if keys is None:
+        # a cheap sample rules out most tiles with many colors
+        if len(np.unique(pixels[::61])) > max_colors:
+            return None
+        keys, indices = np.unique(pixels, return_inverse=True)
+        if len(keys) > max_colors:
+            return None
+    else:
+        indices = np.searchsorted(keys, pixels)
+        np.minimum(indices, len(keys) - 1, out=indices)
+        if not np.array_equal(keys[indices], pixels):
+            return None
+    colors = keys.view("uint8").reshape(-1, 4)
+    return indices.astype("uint8").reshape(rgba.shape[:2]), colors
+
+
+def palette_image(indices, colors):
+    """
+    creates a P mode image with RGBA palette, the alpha values of the
+    palette are stored as tRNS chunk in PNG files
+    """
+    image = Image.frombytes("P", indices.shape[::-1], np.ascontiguousarray(indices).tobytes())
+    image.putpalette(np.ascontiguousarray(colors).tobytes(), rawmode="RGBA")
+    return image
+
+
+class TileEncoder:
+    def __init__(self, preset="default", palette=False, png=None, webp=None):
+        """
+        Encoding options for tiles.
+
+        The image format is chosen based on the file extension (e.g. of the
+        naming scheme), the options for each format are taken from a preset
+        and can be refined individually.
+
+        :param preset: one of "default" (PIL defaults, lossless WebP),
+                       "fast" (fastest compression), "small" (strongest
+                       compression) or "lossy" (lossy WebP)
+        :param palette: store PNG tiles as 8 bit palette images with alpha
+                        (tRNS), one of
+                        False: always store RGBA,
+                        True or "auto": use a palette for tiles with at most
+                        256 distinct colors, other tiles are stored as RGBA,
+                        "quantize": quantize every tile to 256 colors (lossy),
+                        `ColormapLUT` or array of at most 256 RGBA colors:
+                        use this fixed palette for tiles which only contain
+                        its colors, otherwise fall back to "auto" (a LUT
+                        has size + 1 colors including `bad`, so e.g. use
+                        size=255)
+        :param png: additional PIL save options for PNG tiles
+                    (e.g. {"compress_level": 3})
+        :param webp: additional PIL save options for WebP tiles
+                     (e.g. {"quality": 90})
+        """
+        if preset not in PRESETS:
+            raise ValueError("unknown preset {!r}, must be one of {}".format(
+                preset, ", ".join(sorted(PRESETS))))
+        self.palette_keys = None
+        if palette is None:
+            palette = False
+        elif palette is True:
+            palette = "auto"
+        elif not isinstance(palette, str) and palette is not False:
+            self.palette_keys = palette_colors(palette)
+            palette = "auto"
+        elif palette is not False and palette not in PALETTE_MODES:
+            raise ValueError("unknown palette mode {!r}".format(palette))
+        self.preset = preset
+        self.palette = palette
+        self.options = {fmt: dict(options) for fmt, options in PRESETS[preset].items()}
+        self.options["PNG"].update(png or {})
+        self.options["WEBP"].update(webp or {})
+
+    def prepare(self, image, format):
+        """
+        converts an image into the representation which is encoded
+        """
+        if format != "PNG" or self.palette is False or image.mode != "RGBA":
+            return image
+        if self.palette == "quantize":
+            return image.quantize(256, method=FASTOCTREE)
+        rgba = np.asarray(image)
+        indexed = None
+        if self.palette_keys is not None:
+            indexed = palette_indices(rgba, self.palette_keys)
+        if indexed is None:
+            indexed = palette_indices(rgba)
+        if indexed is None:
+            return image
+        return palette_image(*indexed)
+
+    def save(self, image, fileobj, format):
+        """
+        :param image: PIL image
+        :param fileobj: file object to write to
+        :param format: PIL image format (see `image_format`)
+        """
+        image = self.prepare(image, format)
+        image.save(fileobj, format=format, **self.options.get(format, {}))
+
+
+def add_encoder_arguments(parser):
+    """
+    adds command line options for `TileEncoder` to an argparse parser
+    """
+    parser.add_argument("--preset",
+                        choices=sorted(PRESETS),
+                        default="default",
+                        help="encoding preset for output tiles")
+    parser.add_argument("--palette",
+                        nargs="?",
+                        choices=PALETTE_MODES,
+                        const="auto",
+                        default=False,
+                        help="store PNG tiles as 8 bit palette images, either only "
+                             "tiles with at most 256 colors (auto, the default) or "
+                             "all tiles by quantizing them (quantize)")
+
+
+def encoder_from_args(args):
+    return TileEncoder(args.preset, palette=args.palette)
+
+
+def encoder_arguments(encoder):
+    """
+    converts an encoder back into command line options
+    """
+    arguments = []
+    if encoder.preset != "default":
+        arguments += ["--preset", encoder.preset]
+    if encoder.palette:
+        # a fixed palette only determines the order of the colors, "auto"
+        # produces the same pixels
+        arguments += ["--palette", encoder.palette]
+    return arguments
@@ -0,0 +1,102 @@
+import numpy as np
+
+
+def _segments_intersect_box(x0, y0, x1, y1, box):
+    """
+    checks which line segments intersect an axis aligned box
+    (Liang-Barsky clipping, vectorized over segments)
+    """
+    (ymin, xmin), (ymax, xmax) = box
+    dx = x1 - x0
+    dy = y1 - y0
+    p = np.stack([-dx, dx, -dy, dy])
+    q = np.stack([x0 - xmin, xmax - x0, y0 - ymin, ymax - y0])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = q / p
+    t0 = np.max(np.where(p < 0, t, 0.), axis=0)
+    t1 = np.min(np.where(p > 0, t, 1.), axis=0)
+    parallel_outside = np.any((p == 0) & (q < 0), axis=0)
+    return (t0 <= t1) & ~parallel_outside
+
+
+class PolygonFootprint:
+    def __init__(self, vertices):
+        """
+        Footprint given by a polygon in lat/lon coordinates.
+
+        :param vertices: sequence of (lat, lon) pairs, the polygon is closed
+                         automatically
+
+        :note: edges are straight lines in lat/lon, polygons must not cross
+               the antimeridian
+        """
+        vertices = np.asarray(vertices, dtype="float")
+        if np.all(vertices[0] == vertices[-1]):
+            vertices = vertices[:-1]
+        if vertices.ndim != 2 or vertices.shape[1] != 2 or len(vertices) < 3:
+            raise ValueError("a polygon requires at least three (lat, lon) vertices")
+        self.lat = vertices[:, 0]
+        self.lon = vertices[:, 1]
+        self.bbox = ((self.lat.min(), self.lon.min()),
+                     (self.lat.max(), self.lon.max()))
+
+    def contains(self, lat, lon):
+        """
+        checks if a point is inside of the polygon
+        """
+        lat0, lon0 = self.lat, self.lon
+        lat1, lon1 = np.roll(lat0, -1), np.roll(lon0, -1)
+        crosses = (lat0 > lat) != (lat1 > lat)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lon_cross = lon0 + (lat - lat0) * (lon1 - lon0) / (lat1 - lat0)
+        return np.count_nonzero(crosses & (lon < lon_cross)) % 2 == 1
+
+    def intersects(self, bbox):
+        """
+        :param bbox: ((lat_min, lon_min), (lat_max, lon_max))
+        """
+        (lat_min, lon_min), (lat_max, lon_max) = bbox
+        (plat_min, plon_min), (plat_max, plon_max) = self.bbox
+        if (lat_max < plat_min or lat_min > plat_max
+                or lon_max < plon_min or lon_min > plon_max):
+            return False
+        edges = _segments_intersect_box(self.lon, self.lat,
+                                        np.roll(self.lon, -1),
+                                        np.roll(self.lat, -1),
+                                        bbox)
+        if np.any(edges):
+            return True
+        # no edge crosses the box, so it is either completely in- or outside
+        return self.contains((lat_min + lat_max) / 2, (lon_min + lon_max) / 2)
+
+
+class MaskFootprint:
+    def __init__(self, mask, extent):
+        """
+        Footprint given by a (coarse) boolean coverage mask on a regular
+        lat/lon grid.
+
+        :param mask: boolean array of shape (lat, lon), rows are ordered
+                     from `lat_min` to `lat_max` and columns from `lon_min`
+                     to `lon_max`
+        :param extent: ((lat_min, lon_min), (lat_max, lon_max)) of the
+                       outer edges of the mask
+        """
+        self.mask = np.asarray(mask, dtype="bool")
+        if self.mask.ndim != 2:
+            raise ValueError("mask must be two dimensional")
+        (self.lat_min, self.lon_min), (lat_max, lon_max) = extent
+        self.dlat = (lat_max - self.lat_min) / self.mask.shape[0]
+        self.dlon = (lon_max - self.lon_min) / self.mask.shape[1]
+
+    def intersects(self, bbox):
+        """
+        :param bbox: ((lat_min, lon_min), (lat_max, lon_max))
+        """
+        (lat_min, lon_min), (lat_max, lon_max) = bbox
+        n_lat, n_lon = self.mask.shape
+        i0 = max(int(np.floor((lat_min - self.lat_min) / self.dlat)), 0)
+        i1 = min(int(np.ceil((lat_max - self.lat_min) / self.dlat)), n_lat)
+        j0 = max(int(np.floor((lon_min - self.lon_min) / self.dlon)), 0)
+        j1 = min(int(np.ceil((lon_max - self.lon_min) / self.dlon)), n_lon)
+        return bool(np.any(self.mask[i0:i1, j0:j1]))
@@ -0,0 +1,165 @@
+import os
+import re
+import string
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+DEFAULT_NAMING_SCHEME = "{z}/{x}/{y}.png"
+
+
+def _fields(naming_scheme):
+    return set(name for _, name, _, _ in string.Formatter().parse(naming_scheme) if name)
+
+
+def _fixed_prefix(naming_scheme, z):
+    """
+    leading directories of `naming_scheme` which do not depend on x or y
+    """
+    prefix = []
+    for part in naming_scheme.split("/")[:-1]:
+        if _fields(part) - {"z"}:
+            break
+        prefix.append(part.format(z=z))
+    return "/".join(prefix)
+
+
+def tile_name_pattern(naming_scheme, z):
+    """
+    converts a naming scheme into a regular expression matching the names
+    of all tiles in level `z`, x and y are available as named groups
+    """
+    pattern = ""
+    seen = set()
+    for literal, name, _, _ in string.Formatter().parse(naming_scheme):
+        pattern += re.escape(literal)
+        if name in seen:
+            pattern += "(?P={})".format(name)
+        elif name in ("x", "y"):
+            pattern += "(?P<{}>-?[0-9]+)".format(name)
+            seen.add(name)
+        elif name == "z":
+            pattern += re.escape(str(z))
+        elif name is not None:
+            raise ValueError("unknown field {!r} in naming scheme".format(name))
+    return re.compile(pattern)
+
+
+def _scan_folder(folder, depth):
+    """
+    lists the files in `folder` and up to `depth` levels of subfolders
+    (relative paths, "/"-separated), hidden folders (e.g. `.lltiler-dedup`)
+    are skipped
+    """
+    names = []
+    try:
+        entries = list(os.scandir(folder))
+    except (FileNotFoundError, NotADirectoryError):
+        return names
+    for entry in entries:
+        if entry.is_dir():
+            if depth > 0 and not entry.name.startswith("."):
+                names.extend(entry.name + "/" + name
+                             for name in _scan_folder(entry.path, depth - 1))
+        else:
+            names.append(entry.name)
+    return names
+
+
+def _parse_names(names, pattern):
+    # a single search over all names of a folder is considerably faster than
+    # matching each name individually
+    found = pattern.findall("\n".join(names))
+    tiles = np.array(found, dtype="int64").reshape(-1, 2)
+    return tiles[:, [pattern.groupindex["x"] - 1, pattern.groupindex["y"] - 1]]
+
+
+def scan_tiles(folder, z, naming_scheme=DEFAULT_NAMING_SCHEME, threads=None):
+    """
+    finds all tiles of level `z` stored in `folder`
+
+    The tile folders are listed using `os.scandir`, the subfolders of the
+    first level depending on x or y (e.g. the x folders) are scanned in
+    parallel, which mainly pays off on network file systems.
+
+    :param folder: data folder of a tileset
+    :param z: level
+    :param naming_scheme: pattern for tilenames (see `LLTiler`)
+    :param threads: number of threads scanning folders in parallel
+    :returns: int64 array of shape (N, 2) with x and y of each tile
+    """
+    prefix = _fixed_prefix(naming_scheme, z)
+    parts = naming_scheme.split("/")[len(prefix.split("/")) if prefix else 0:]
+    pattern = tile_name_pattern("/".join(parts), z)
+    pattern = re.compile("^(?:{})$".format(pattern.pattern), re.MULTILINE)
+    root = os.path.join(folder, prefix)
+    depth = len(parts) - 1
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return np.empty((0, 2), dtype="int64")
+    folders = [entry.name for entry in entries
+               if depth > 0 and entry.is_dir() and not entry.name.startswith(".")]
+    found = [_parse_names([entry.name for entry in entries if not entry.is_dir()], pattern)]
+
+    def scan(name):
+        names = _scan_folder(os.path.join(root, name), depth - 1)
+        return _parse_names([name + "/" + filename for filename in names], pattern)
+
+    if folders:
+        with ThreadPoolExecutor(threads) as executor:
+            found.extend(executor.map(scan, folders))
+    return np.concatenate(found)
+
+
+def scan_layers(input_dir, z, naming_scheme=DEFAULT_NAMING_SCHEME, threads=None):
+    """
+    finds the tiles of level `z` of all layers (tilesets) in `input_dir`
+
+    :returns: dict mapping layer names to arrays of shape (N, 2)
+              (see `scan_tiles`)
+    """
+    return {layer: scan_tiles(os.path.join(input_dir, layer), z, naming_scheme, threads)
+            for layer in sorted(os.listdir(input_dir))
+            if os.path.isdir(os.path.join(input_dir, layer))}
+
+
+def tile_keys(tiles):
+    """
+    packs tiles into single int64 keys (x << 32) | y, the keys sort like
+    the tiles by x and y
+
+    :param tiles: int array of shape (N, 2) with non-negative x and y
+    """
+    tiles = np.asarray(tiles, dtype="int64").reshape(-1, 2)
+    return (tiles[:, 0] << 32) | tiles[:, 1]
+
+
+def keys_to_tiles(keys):
+    """
+    unpacks keys created by `tile_keys` into an array of shape (N, 2)
+    """
+    keys = np.asarray(keys, dtype="int64")
+    return np.stack([keys >> 32, keys & 0xffffffff], axis=-1)
+
+
+def layers_by_tile(layers):
+    """
+    inverts the result of `scan_layers`
+
+    The tiles of all layers are grouped on their packed keys (see
+    `tile_keys`), no Python objects are created per tile.
+
+    :returns: (names, tiles, membership) with the sorted list of layer
+              `names`, the distinct `tiles` of all layers sorted by x and y
+              as int64 array of shape (N, 2) and a boolean array
+              `membership` of shape (N, len(names)), which is True where a
+              layer contains a tile
+    """
+    names = sorted(layers)
+    keys = [tile_keys(layers[name]) for name in names]
+    unique, inverse = np.unique(np.concatenate(keys + [np.empty(0, dtype="int64")]),
+                                return_inverse=True)
+    membership = np.zeros((len(unique), len(names)), dtype=bool)
+    membership[inverse, np.repeat(np.arange(len(names)), [len(k) for k in keys])] = True
+    return names, keys_to_tiles(unique), membership
@@ -1,8 +1,19 @@
 import os
+import copy
+import collections
+import string
+import posixpath
 import itertools
+import functools
+import heapq
+import multiprocessing
 import numpy as np
 from PIL import Image
 
+from .traversal import sort_tiles, morton_key
+from .tilewriter import TileWriter, AsyncTileWriter
+from .inventory import scan_tiles
+
 
 def numTiles(z):
     return 2**z
@@ -46,16 +57,232 @@ def xy2latlon(x, y, z):
     return lat, lon
 
 
-def render_tile(x, y, z, callback, tilesize=256):
-    ys = ((np.arange(tilesize) + .5) / tilesize)[:, np.newaxis]
-    xs = ys.T
-    xs, ys = np.broadcast_arrays(x + xs, y + ys)
-    lat, lon = xy2latlon(xs, ys, z)
+def tile_bbox(x, y, z):
+    """
+    computes the lat/lon bounding box of a tile
+
+    :returns: ((lat_min, lon_min), (lat_max, lon_max))
+    """
+    lat_max, lon_min = xy2latlon(x, y, z)
+    lat_min, lon_max = xy2latlon(x + 1, y + 1, z)
+    return (lat_min, lon_min), (lat_max, lon_max)
+
+
+@functools.lru_cache(maxsize=4096)
+def tile_lats(y, z, tilesize=256):
+    """
+    computes the latitudes of the pixel centers of tile row `y`
+
+    :note: the result is cached and therefore read-only
+    """
+    ys = y + (np.arange(tilesize) + .5) / tilesize
+    lat, _ = xy2latlon(0., ys, z)
+    lat.setflags(write=False)
+    return lat
+
+
+@functools.lru_cache(maxsize=4096)
+def tile_lons(x, z, tilesize=256):
+    """
+    computes the longitudes of the pixel centers of tile column `x`
+
+    :note: the result is cached and therefore read-only
+    """
+    xs = x + (np.arange(tilesize) + .5) / tilesize
+    lon = -180.0 + 360.0 * xs / numTiles(z)
+    lon.setflags(write=False)
+    return lon
+
+
+def render_tile(x, y, z, callback, tilesize=256, separable=False):
+    """
+    renders a single tile
+
+    :param callback: function accepting lat and lon arrays
+                     and returning RGBA values
+    :param separable: if True, `callback` receives the 1D latitude
+                      (along rows) and longitude (along columns) axes
+                      of the tile instead of 2D arrays
+
+    :note: lat and lon are passed as read-only broadcast views
+    """
+    lat = tile_lats(y, z, tilesize)
+    lon = tile_lons(x, z, tilesize)
+    if separable:
+        return callback(lat, lon)
+    lat, lon = np.broadcast_arrays(lat[:, np.newaxis], lon[np.newaxis, :])
     return callback(lat, lon)
 
 
+def render_tiles(tiles, z, callback, tilesize=256, separable=False):
+    """
+    renders multiple tiles using a single call to `callback`
+
+    :param tiles: sequence of (x, y) tile indices
+    :param z: zoom level of all tiles
+    :param callback: function accepting lat and lon arrays of shape
+                     (K, tilesize, tilesize) and returning RGBA values
+                     of shape (K, tilesize, tilesize, 4)
+    :param separable: if True, `callback` receives latitude and longitude
+                      axes of shape (K, tilesize) instead
+    :returns: array of RGBA values, one tile per entry along the first axis
+    """
+    lat = np.stack([tile_lats(y, z, tilesize) for _, y in tiles])
+    lon = np.stack([tile_lons(x, z, tilesize) for x, _ in tiles])
+    if separable:
+        return callback(lat, lon)
+    lat, lon = np.broadcast_arrays(lat[:, :, np.newaxis],
+                                   lon[:, np.newaxis, :])
+    return callback(lat, lon)
+
+
+def quadtree_tiles(x_range, y_range, z, is_empty, level=0):
+    """
+    walks the tile quadtree top-down and yields all tiles of level `z`
+    within the given ranges, children are visited in Z-order
+
+    :param x_range: range of tile x indices in level `z`
+    :param y_range: range of tile y indices in level `z`
+    :param is_empty: function (x, y, level) returning True if the tile and
+                     therefore its whole subtree can be skipped
+    :param level: level at which the walk is started
+    """
+    def walk(x, y, level):
+        shift = z - level
+        if ((x + 1) << shift <= x_range.start or x << shift >= x_range.stop
+                or (y + 1) << shift <= y_range.start or y << shift >= y_range.stop):
+            return
+        if is_empty(x, y, level):
+            return
+        if shift == 0:
+            yield x, y
+            return
+        for dy, dx in [(0, 0), (0, 1), (1, 0), (1, 1)]:
+            yield from walk(2 * x + dx, 2 * y + dy, level + 1)
+
+    level = min(level, z)
+    shift = z - level
+    roots = itertools.product(
+            range(x_range.start >> shift, ((x_range.stop - 1) >> shift) + 1),
+            range(y_range.start >> shift, ((y_range.stop - 1) >> shift) + 1))
+    for x, y in sort_tiles(roots, "zorder", level):
+        yield from walk(x, y, level)
+
+
+def _probe_tile(callback, batched, separable, tilesize, x, y, z):
+    if batched:
+        return render_tiles([(x, y)], z, callback, tilesize, separable)
+    return render_tile(x, y, z, callback, tilesize, separable)
+
+
+class _EmptyTileTest:
+    """
+    checks if a tile (and therefore its subtree) can be skipped
+    """
+    def __init__(self, base_level, footprint=None, is_empty=None, probe=None):
+        self.base_level = base_level
+        self.footprint = footprint
+        self.is_empty = is_empty
+        self.probe = probe
+
+    def __call__(self, x, y, z):
+        if self.footprint is not None or self.is_empty is not None:
+            bbox = tile_bbox(x, y, z)
+            if self.footprint is not None and not self.footprint.intersects(bbox):
+                return True
+            if self.is_empty is not None and self.is_empty(bbox):
+                return True
+        if self.probe is not None and z < self.base_level:
+            return not np.any(self.probe(x, y, z)[..., -1] != 0)
+        return False
+
+
+def _batched(iterable, n):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, n))
+        if not batch:
+            return
+        yield batch
+
+
+_worker_function = None
+
+
+def _init_worker(function):
+    global _worker_function
+    _worker_function = function
+
+
+def _call_worker(item):
+    return _worker_function(item)
+
+
+def _chunksize(num_tasks, workers, max_chunksize=16):
+    """
+    tasks sent to a worker at once: about four chunks per worker (like
+    `Pool.map`), but limited such that results keep arriving steadily
+    """
+    if not workers:
+        return 1
+    return max(1, min(num_tasks // (4 * workers), max_chunksize))
+
+
+def _imap(function, iterable, workers=None, ordered=True, chunksize=1):
+    """
+    maps `function` over `iterable`, in a pool of `workers` processes if
+    given
+
+    `function` (e.g. a partial holding the callback and the tile writer) is
+    sent to each worker process once when it is started, the tasks only
+    consist of the items of `iterable`. This also keeps state of
+    `function`, like the folders created by a `TileWriter`, across tasks.
+    """
+    if workers is None:
+        yield from map(function, iterable)
+        return
+    with multiprocessing.Pool(workers, _init_worker, (function,)) as pool:
+        if ordered:
+            yield from pool.imap(_call_worker, iterable, chunksize)
+        else:
+            yield from pool.imap_unordered(_call_worker, iterable, chunksize)
+
+
+def _progress_function(show_progress):
+    if show_progress:
+        from tqdm import tqdm
+        return tqdm
+
+    def progress(x, total):
+        return x
+    return progress
+
+
+def _report_completed(results, hooks, writer):
+    """
+    calls `hooks` for each batch of tiles as soon as all tiles of the batch
+    have been written by `writer`
+    """
+    pending = collections.deque()
+    for batch in results:
+        yield from batch
+        pending.append(([xy for xy, _ in batch], writer.mark()))
+        while pending and writer.done(pending[0][1]):
+            tiles, _ = pending.popleft()
+            for hook in hooks:
+                hook(tiles)
+    writer.flush()
+    for tiles, _ in pending:
+        for hook in hooks:
+            hook(tiles)
+
+
 class TileSelector:
-    pass
+    def completed(self, tiles):
+        """
+        called by `LLTiler.render` after the given tiles have been stored
+        """
+        pass
 
 
 class AllTileSelector(TileSelector):
@@ -70,15 +297,21 @@ class AllTileSelector(TileSelector):
 
 
 class ChunkTileSelector(TileSelector):
-    def __init__(self, num_chunks, chunk):
+    def __init__(self, num_chunks, chunk, contiguous=False):
         """
         Selects tiles based on chunks.
 
         All tiles are split into `num_chunk` approximately equally sized chunks
         but only the tiles belonging to chunk no `chunk` are selected.
+
+        :param contiguous: if True, each chunk consists of consecutive tiles
+                           in traversal order instead of every `num_chunks`th
+                           tile, combined with "zorder" or "hilbert"
+                           traversal, chunks are spatially compact
         """
         self.num_chunks = num_chunks
         self.chunk = chunk
+        self.contiguous = contiguous
 
     def len(self, total):
         rem = total % self.num_chunks
@@ -88,21 +321,190 @@ class ChunkTileSelector(TileSelector):
         return sub
 
     def select(self, tilegen):
+        if self.contiguous:
+            tiles = list(tilegen)
+            sub, rem = divmod(len(tiles), self.num_chunks)
+            start = self.chunk * sub + min(self.chunk, rem)
+            return tiles[start:start + self.len(len(tiles))]
         return itertools.islice(tilegen, self.chunk, None, self.num_chunks)
 
 
+def partition_weights(weights, num_chunks):
+    """
+    splits a sequence of weights into `num_chunks` contiguous runs of
+    approximately equal total weight
+
+    :returns: chunk number for each weight
+    """
+    weights = np.asarray(weights, dtype="float")
+    total = weights.sum()
+    if total <= 0:
+        return np.zeros(len(weights), dtype="int")
+    mid = np.cumsum(weights) - weights / 2
+    return np.minimum((mid * num_chunks / total).astype("int"), num_chunks - 1)
+
+
+def partition_greedy(weights, num_chunks):
+    """
+    distributes weights to `num_chunks` chunks, assigning the largest
+    remaining weight to the currently least loaded chunk
+
+    :returns: chunk number for each weight
+    """
+    weights = np.asarray(weights, dtype="float")
+    chunks = np.empty(len(weights), dtype="int")
+    loads = [(0., chunk) for chunk in range(num_chunks)]
+    for i in np.argsort(-weights, kind="stable"):
+        load, chunk = heapq.heappop(loads)
+        chunks[i] = chunk
+        heapq.heappush(loads, (load + weights[i], chunk))
+    return chunks
+
+
+class CostTileSelector(TileSelector):
+    def __init__(self, num_chunks, chunk, cost=None, compact=True):
+        """
+        Selects tiles based on chunks of approximately equal cost.
+
+        Tiles are split (in traversal order) into `num_chunks` contiguous
+        runs of approximately equal estimated cost, only the tiles belonging
+        to chunk no `chunk` are selected.
+
+        :param cost: optional function (x, y) returning the estimated cost
+                     of rendering a tile (e.g. `CoverageCost`), by default
+                     all tiles cost the same
+        :param compact: if False, tiles are not split into contiguous runs
+                        but distributed greedily (largest cost first), which
+                        balances better but gives up spatial locality
+
+        :note: `chunk_costs` and `makespan` are available after `select`
+        """
+        self.num_chunks = num_chunks
+        self.chunk = chunk
+        self.cost = cost
+        self.compact = compact
+        self.chunk_costs = None
+        self._count = None
+
+    @property
+    def makespan(self):
+        """
+        predicted cost of the most expensive chunk
+        """
+        return self.chunk_costs.max()
+
+    def len(self, total):
+        """
+        :note: only available after `select`
+        """
+        return self._count
+
+    def tile_costs(self, tiles):
+        if self.cost is None:
+            return np.ones(len(tiles))
+        return np.array([self.cost(x, y) for x, y in tiles], dtype="float")
+
+    def units(self, tiles):
+        """
+        groups tiles into units which are always assigned to the same chunk
+
+        :returns: (number of units, unit number of each tile)
+        """
+        return len(tiles), np.arange(len(tiles))
+
+    def select(self, tilegen):
+        tiles = list(tilegen)
+        n_units, unit_of_tile = self.units(tiles)
+        unit_costs = np.bincount(unit_of_tile,
+                                 weights=self.tile_costs(tiles),
+                                 minlength=n_units)
+        if self.compact:
+            chunks = partition_weights(unit_costs, self.num_chunks)
+        else:
+            chunks = partition_greedy(unit_costs, self.num_chunks)
+        self.chunk_costs = np.bincount(chunks, weights=unit_costs,
+                                       minlength=self.num_chunks)
+        selected = chunks[unit_of_tile] == self.chunk
+        tiles = [tile for tile, s in zip(tiles, selected) if s]
+        self._count = len(tiles)
+        return tiles
+
+
+class BlockTileSelector(CostTileSelector):
+    def __init__(self, num_chunks, chunk, block_levels, cost=None, compact=True):
+        """
+        Selects tiles based on chunks of complete quadtree subtrees.
+
+        Tiles are grouped into blocks of 2**block_levels x 2**block_levels
+        tiles (i.e. subtrees rooted `block_levels` above the base level).
+        Blocks are ordered in Z-order and split into `num_chunks` contiguous
+        runs of approximately equal cost, only the tiles belonging to chunk
+        no `chunk` are selected. Thus, each chunk covers a compact region
+        and can build all pyramid levels down to its block roots.
+
+        :param cost: optional function (x, y) returning the estimated cost
+                     of rendering a tile, by default all tiles cost the same
+        :param compact: if False, blocks are distributed greedily instead of
+                        in contiguous runs (see `CostTileSelector`)
+        """
+        super().__init__(num_chunks, chunk, cost, compact)
+        self.block_levels = block_levels
+
+    def units(self, tiles):
+        xy = np.array(tiles, dtype="int64").reshape(-1, 2)
+        blocks, block_of_tile = np.unique(
+                morton_key(xy[:, 0] >> self.block_levels,
+                           xy[:, 1] >> self.block_levels, None),
+                return_inverse=True)
+        return len(blocks), block_of_tile.ravel()
+
+
+class CoverageCost:
+    def __init__(self, callback, z, tilesize=16, empty_cost=0.05, separable=False):
+        """
+        Estimates the cost of rendering tiles from a low resolution pass.
+
+        Each tile is rendered using `tilesize` x `tilesize` pixels, the
+        estimated cost is `empty_cost` plus the fraction of non-transparent
+        pixels.
+
+        :param callback: render callback (see `LLTiler.render`)
+        :param z: level of the tiles to be estimated
+        """
+        self.callback = callback
+        self.z = z
+        self.tilesize = tilesize
+        self.empty_cost = empty_cost
+        self.separable = separable
+
+    def __call__(self, x, y):
+        tile = render_tile(x, y, self.z, self.callback,
+                           self.tilesize, self.separable)
+        return self.empty_cost + np.mean(tile[..., -1] != 0)
+
+
 class LLTiler:
     def __init__(self,
                  data_folder,
                  base_level=None,
                  size_hint=None,
-                 naming_scheme="{z}/{x}/{y}.png"):
+                 naming_scheme="{z}/{x}/{y}.png",
+                 fsync=False,
+                 encoder=None,
+                 dedup=None):
         """
         :param data_folder: folder to store tiles
         :param base_level: level in which tiles should be computed
         :param size_tint: smallest size meters to be resolved
         :param naming_scheme: pattern for tilenames,
                               must include x, y and z placeholders
+        :param fsync: if True, each tile is flushed to disk after writing
+        :param encoder: `TileEncoder` configuring the encoding of tiles, the
+                        image format follows the extension of `naming_scheme`
+        :param dedup: deduplicate identical tiles, either "uniform" (tiles of
+                      a single color) or "all", see `TileWriter`. Shared
+                      tiles are stored in `.lltiler-dedup` in `data_folder`
+                      and hard linked.
 
         :note: either `base_level` or `size_hint` must be given
         """
@@ -115,21 +517,202 @@ class LLTiler:
         self.base_level = base_level
 
         self.naming_scheme = naming_scheme
-
-    def render(self, extent, callback, show_progress=False, selector=AllTileSelector()):
+        self.writer = TileWriter(fsync=fsync, encoder=encoder, dedup=dedup,
+                                 dedup_folder=os.path.join(data_folder, ".lltiler-dedup"))
+
+    def render(self, extent, callback, show_progress=False, selector=AllTileSelector(),
+               workers=None, ordered=True, batch_size=None, separable=False,
+               footprint=None, is_empty=None, prune_level=None, probe_size=None,
+               pyramid_level=None, order=None, resume=False, precreate_folders=False,
+               writer_threads=None, pyramid_resampling="box"):
         """
         :param extent: ((lat_min, lon_min), (lat_max, lon_max))
         :param callback: function accepting lat and a lon array
                          and returns RGBA values
+        :param workers: number of worker processes used for rendering,
+                        `None` renders all tiles in the current process
+        :param ordered: if False, tiles are collected in order of completion
+                        instead of selection order (only used with `workers`)
+        :param batch_size: if given, `callback` is called once for up to
+                           `batch_size` tiles with lat and lon arrays of shape
+                           (batch_size, 256, 256) and must return RGBA values
+                           of shape (batch_size, 256, 256, 4)
+        :param separable: if True, `callback` receives the latitude axis
+                          (along tile rows) and longitude axis (along tile
+                          columns) as 1D arrays of length 256 (or of shape
+                          (batch_size, 256) in batch mode) instead of 2D grids
+        :param footprint: optional object providing an `intersects(bbox)`
+                          method (e.g. `PolygonFootprint` or `MaskFootprint`),
+                          tiles which do not intersect the footprint are
+                          skipped without calling `callback`
+        :param is_empty: optional function accepting a tile bounding box
+                         ((lat_min, lon_min), (lat_max, lon_max)) and
+                         returning True if there is no data within the box
+        :param prune_level: if given, tiles are enumerated by walking the
+                            tile quadtree from this level down to
+                            `base_level`, skipping whole subtrees which are
+                            found to be empty by `footprint`, `is_empty` or
+                            the probe
+        :param probe_size: if given together with `prune_level`, tiles above
+                           `base_level` are probed by calling `callback` for
+                           a coarse grid of `probe_size` x `probe_size`
+                           pixels, subtrees are skipped if the probe is
+                           completely transparent
+        :param pyramid_level: if given, coarser tiles down to this level are
+                              generated on the fly from the rendered tiles,
+                              tiles are then enumerated in Z-order by default
+        :param pyramid_resampling: downsampling filter for the coarser tiles,
+                                   "box", "lanczos", "mode" or "nearest"
+        :param order: order in which tiles are traversed, one of "linear"
+                      (x-major, default), "zorder" or "hilbert" (default
+                      with `prune_level` or `pyramid_level` is "zorder")
+        :param resume: if True, tiles which have been completed by a previous
+                       run (i.e. tiles which exist or which are listed in the
+                       completion manifest) are not rendered again, newly
+                       completed tiles are added to the manifest
+        :param precreate_folders: if True, all folders for the tiles within
+                                  `extent` (and the pyramid levels) are
+                                  created up front, storing a tile then
+                                  only creates the tile file
+        :param writer_threads: if given, tiles are encoded and written by
+                               this number of background threads, while
+                               rendering continues (not available with
+                               `workers`, the worker processes write their
+                               tiles themselves)
+
+        :note: with `pyramid_level`, parent tiles are only complete if
+               `selector` selects complete subtrees
+        :note: if `workers` is given, `callback` must be picklable,
+               i.e. usually a module level function
+        :note: with `pyramid_level`, rendered tiles are kept in memory until
+               their parent tiles are complete, `callback` must therefore
+               return a new array for each call (i.e. must not reuse an
+               output buffer, e.g. `ColormapLUT(..., out=...)`)
         """
 
-        if show_progress:
-            from tqdm import tqdm
-            progress = tqdm
+        progress = _progress_function(show_progress)
+
+        if probe_size is None:
+            probe = None
         else:
-            def progress(x, total):
-                return x
+            probe = functools.partial(_probe_tile, callback,
+                                      batch_size is not None, separable, probe_size)
+        if pyramid_level is not None:
+            if not ordered or order == "linear":
+                raise ValueError("pyramid_level requires ordered rendering "
+                                 "in Z-order or Hilbert order")
+            order = order or "zorder"
+        if writer_threads and workers is not None:
+            raise ValueError("writer_threads cannot be combined with workers")
+
+        tiles, total = self._select_tiles(extent, selector, order, prune_level,
+                                          footprint, is_empty, probe)
+        batches, hooks = self._work_items(_batched(tiles, batch_size or 1),
+                                          selector, resume)
+
+        tiler = self._render_tiler(extent, precreate_folders, pyramid_level,
+                                   writer_threads)
+        stream = None
+        if pyramid_level is not None:
+            from .pyramid import PyramidStream
+            stream = PyramidStream(pyramid_level, tiler._store_image, pyramid_resampling)
+
+        work = functools.partial(tiler._render_and_store,
+                                 callback, batch_size is not None, separable,
+                                 stream is not None)
+        try:
+            chunksize = _chunksize(-(-total // (batch_size or 1)), workers)
+            results = _report_completed(_imap(work, batches, workers, ordered, chunksize),
+                                        hooks, tiler.writer)
+            for (x, y), tile in progress(results, total=total):
+                if stream is not None and tile is not None:
+                    stream.push(tile, x, y, self.base_level)
+            if stream is not None:
+                stream.close()
+        finally:
+            tiler.writer.close()
+
+    def _work_items(self, batches, selector, resume):
+        """
+        attaches the tiles to be skipped to each batch
+
+        :returns: (work items, completion hooks)
+        """
+        hooks = [selector.completed]
+        if not resume:
+            return ((batch, ()) for batch in batches), hooks
+        os.makedirs(self.data_folder, exist_ok=True)
+        done = self.completed_tiles()
+        hooks.append(functools.partial(self._write_manifest, done))
+        return ((batch, done.intersection(batch)) for batch in batches), hooks
+
+    def _render_tiler(self, extent, precreate_folders, min_level, writer_threads):
+        """
+        creates a copy of this tiler with a writer set up for rendering
+        """
+        tiler = copy.copy(self)
+        tiler.writer = copy.copy(self.writer)
+        if precreate_folders:
+            self.create_folders(extent, min_level=min_level)
+            tiler.writer.create_folders = False
+        if writer_threads:
+            tiler.writer = AsyncTileWriter(tiler.writer, writer_threads)
+        return tiler
+
+    def _select_tiles(self, extent, selector, order=None, prune_level=None,
+                      footprint=None, is_empty=None, probe=None):
+        x_range, y_range = self.tile_range(extent)
+        empty = _EmptyTileTest(self.base_level, footprint, is_empty, probe)
+        if prune_level is not None:
+            tiles = list(quadtree_tiles(x_range, y_range, self.base_level,
+                                        empty, prune_level))
+        elif footprint is None and is_empty is None:
+            tiles = itertools.product(x_range, y_range)
+        else:
+            tiles = [(x, y) for x, y in itertools.product(x_range, y_range)
+                     if not empty(x, y, self.base_level)]
+        if order is not None:
+            tiles = sort_tiles(tiles, order, self.base_level)
+        if isinstance(tiles, list):
+            count = len(tiles)
+        else:
+            count = len(x_range) * len(y_range)
+        selected = selector.select(tiles)  # must be called before len
+        return selected, selector.len(count)
+
+    def create_folders(self, extent, min_level=None):
+        """
+        creates all folders for tiles within `extent` at once
+
+        :param extent: ((lat_min, lon_min), (lat_max, lon_max))
+        :param min_level: if given, folders for all levels from `base_level`
+                          down to `min_level` are created
+        """
+        x_range, y_range = self.tile_range(extent)
+        folder_scheme = posixpath.dirname(self.naming_scheme)
+        fields = set(name for _, name, _, _ in string.Formatter().parse(folder_scheme) if name)
+        min_level = self.base_level if min_level is None else min_level
+        for z in range(self.base_level, min_level - 1, -1):
+            shift = self.base_level - z
+            xs = range(x_range.start >> shift, ((x_range.stop - 1) >> shift) + 1)
+            ys = range(y_range.start >> shift, ((y_range.stop - 1) >> shift) + 1)
+            if "x" not in fields:
+                xs = xs[:1]
+            if "y" not in fields:
+                ys = ys[:1]
+            for x, y in itertools.product(xs, ys):
+                self.writer.makedirs(os.path.dirname(self.tile_path(x, y, z)))
+
+    def tile_range(self, extent):
+        """
+        computes the ranges of tile indices covering a given extent
 
+        :param extent: ((lat_min, lon_min), (lat_max, lon_max))
+        :returns: (x_range, y_range) in `base_level`
+
+        :note: if `base_level` is not yet known, it is derived from
+               `size_hint` and the given extent
+        """
         (lat_min, lon_min), (lat_max, lon_max) = extent
 
         if lat_min * lat_max < 0:
@@ -149,22 +732,88 @@ class LLTiler:
         y_min = int(min(y1, y2))
         y_max = int(max(y1, y2))
 
-        total = selector.len((x_max - x_min + 1) * (y_max - y_min + 1))
+        return range(x_min, x_max + 1), range(y_min, y_max + 1)
 
-        for x, y in progress(selector.select(
-                itertools.product(range(x_min, x_max + 1), range(y_min, y_max + 1))),
-                total=total):
-            tile = render_tile(x, y, self.base_level, callback)
-            if np.any(tile[..., -1] != 0):  # check if all transparent
+    def _render_and_store(self, callback, batched, separable, keep, work):
+        tiles, skip = work
+        todo = [tile for tile in tiles if tile not in skip]
+        if not todo:
+            rendered = []
+        elif batched:
+            rendered = render_tiles(todo, self.base_level, callback,
+                                    separable=separable)
+        else:
+            rendered = (render_tile(x, y, self.base_level, callback,
+                                    separable=separable)
+                        for x, y in todo)
+        rendered = dict(zip(todo, rendered))
+        results = []
+        for x, y in tiles:
+            if (x, y) not in rendered:
+                tile = self.load_tile(x, y, self.base_level) if keep else None
+            elif np.any(rendered[(x, y)][..., -1] != 0):  # check if all transparent
+                tile = rendered[(x, y)]
                 self.store_tile(tile, x, y, self.base_level)
+            else:
+                tile = None
+            results.append(((x, y), tile if keep else None))
+        return results
+
+    def manifest_path(self, z=None):
+        """
+        path of the completion manifest used by `render(..., resume=True)`
+        """
+        z = self.base_level if z is None else z
+        return os.path.join(self.data_folder, ".lltiler-manifest-{}".format(z))
+
+    def completed_tiles(self, z=None):
+        """
+        collects all tiles of level `z` (default: `base_level`) which are
+        either listed in the completion manifest or exist on disk
+
+        :note: existing tiles are found using a single scan of the tile
+               directory tree instead of checking each tile individually
+        """
+        z = self.base_level if z is None else z
+        done = set()
+        try:
+            with open(self.manifest_path(z)) as manifest:
+                for line in manifest:
+                    x, y = line.split()
+                    done.add((int(x), int(y)))
+        except FileNotFoundError:
+            pass
+        done.update(map(tuple, scan_tiles(self.data_folder, z, self.naming_scheme).tolist()))
+        return done
+
+    def _write_manifest(self, done, tiles):
+        tiles = [tile for tile in tiles if tile not in done]
+        if not tiles:
+            return
+        with open(self.manifest_path(), "a") as manifest:
+            manifest.write("".join("{} {}\n".format(x, y) for x, y in tiles))
 
     def tile_path(self, x, y, z):
         return os.path.join(self.data_folder,
                             self.naming_scheme.format(x=x, y=y, z=z))
 
+    def _store_image(self, image, x, y, z):
+        self.store_tile(np.asarray(image), x, y, z)
+
+    def load_tile(self, x, y, z):
+        """
+        loads a stored tile as RGBA array, returns None if it does not exist
+        """
+        try:
+            image = Image.open(self.tile_path(x, y, z))
+        except FileNotFoundError:
+            return None
+        return np.asarray(image.convert("RGBA"))
+
     def store_tile(self, tile, x, y, z):
-        filename = self.tile_path(x, y, z)
-        folder = os.path.dirname(filename)
-        os.makedirs(folder, exist_ok=True)
-        image = Image.fromarray(tile)
-        image.save(filename)
+        """
+        stores a tile, the file is written to a temporary file first and
+        renamed afterwards, such that no partially written tiles remain if
+        the process is interrupted
+        """
+        self.writer.write(tile, self.tile_path(x, y, z))
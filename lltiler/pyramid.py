@@ -0,0 +1,230 @@
+import os
+from itertools import compress
+
+import numpy as np
+
+from .lltiler import _imap
+from .tilewriter import TileWriter
+from .compositing import overlay
+from .downsample import as_rgba, combine, reduce_block
+from .inventory import DEFAULT_NAMING_SCHEME, scan_layers, layers_by_tile, tile_keys, keys_to_tiles
+
+CHILD_OFFSETS = [(0, 0), (0, 1), (1, 0), (1, 1)]  # tl, bl, tr, br
+
+
+def tile_name(basedir, x, y, z):
+    return os.path.join(basedir, str(z), str(x), "%d.png" % y)
+
+
+def find_layer_tiles(input_dir, base_level, naming_scheme=DEFAULT_NAMING_SCHEME):
+    """
+    collects all tiles of all layers in `input_dir`
+
+    :returns: (names, tiles, membership) (see `layers_by_tile`)
+    """
+    return layers_by_tile(scan_layers(input_dir, base_level, naming_scheme))
+
+
+def combine_children(children, x, y, resampling="box"):
+    """
+    combines the available children of tile (x, y) into the parent tile
+
+    :param children: dict mapping child tile indices to images,
+                     missing children are transparent
+    :param resampling: downsampling filter (see `downsample`)
+    """
+    images = [children.get((2 * x + sx, 2 * y + sy)) for sx, sy in CHILD_OFFSETS]
+    return combine(*images, resampling=resampling)
+
+
+def reduce_tiles(x, y, z, leaf_level, present, leaf, store, resampling="box"):
+    """
+    builds tile (x, y, z) from the leaves of its subtree (depth first)
+
+    :param present: dict mapping levels to sets of non-empty tiles
+    :param leaf: function (x, y) returning the image of a leaf tile
+    :param store: function (image, x, y, z) storing a generated tile
+    :param resampling: downsampling filter (see `downsample`)
+    :returns: image of tile (x, y, z)
+    """
+    if z == leaf_level:
+        return leaf(x, y)
+    children = {}
+    for sx, sy in CHILD_OFFSETS:
+        cx, cy = 2 * x + sx, 2 * y + sy
+        if (cx, cy) in present[z + 1]:
+            children[(cx, cy)] = reduce_tiles(cx, cy, z + 1, leaf_level,
+                                              present, leaf, store, resampling)
+    image = combine_children(children, x, y, resampling)
+    store(image, x, y, z)
+    return image
+
+
+def present_tiles(tiles, leaf_level, root_level):
+    """
+    computes all non-empty tiles between `leaf_level` and `root_level`
+    """
+    present = {leaf_level: set(tiles)}
+    for z in range(leaf_level - 1, root_level - 1, -1):
+        present[z] = set((x // 2, y // 2) for x, y in present[z + 1])
+    return present
+
+
+class PyramidStream:
+    def __init__(self, min_level, store, resampling="box"):
+        """
+        Builds parent tiles on the fly from a stream of tiles.
+
+        Tiles must be pushed in Z-order (see `quadtree_tiles`), such that
+        all children of a parent tile are pushed consecutively. Only the
+        children of the current parent tile are buffered for each level.
+
+        :param min_level: coarsest level to be generated
+        :param store: function (image, x, y, z) storing a generated tile
+        :param resampling: downsampling filter (see `downsample`)
+        """
+        self.min_level = min_level
+        self.store = store
+        self.resampling = resampling
+        self.pending = {}
+
+    def push(self, image, x, y, z):
+        """
+        adds a non-empty tile, completed parent tiles are stored
+        """
+        if z <= self.min_level:
+            return
+        parent = (x // 2, y // 2)
+        if z in self.pending and self.pending[z][0] != parent:
+            self._flush(z)
+        self.pending.setdefault(z, (parent, {}))[1][(x, y)] = image
+
+    def close(self):
+        """
+        stores all remaining parent tiles
+        """
+        while self.pending:
+            self._flush(max(self.pending))
+
+    def _flush(self, z):
+        (x, y), children = self.pending.pop(z)
+        image = combine_children(children, x, y, self.resampling)
+        self.store(image, x, y, z - 1)
+        self.push(image, x, y, z - 1)
+
+
+class _SubtreeBuilder:
+    def __init__(self, input_dir, output_dir, base_level, encoder=None, dedup=None,
+                 resampling="box", naming_scheme=DEFAULT_NAMING_SCHEME):
+        self.input_dir = input_dir
+        self.naming_scheme = naming_scheme
+        self.output_dir = output_dir
+        self.base_level = base_level
+        self.resampling = resampling
+        self.writer = TileWriter(encoder=encoder, dedup=dedup,
+                                 dedup_folder=os.path.join(output_dir, ".lltiler-dedup"))
+
+    def store(self, image, x, y, z):
+        self.writer.write(image, tile_name(self.output_dir, x, y, z))
+
+    def leaf(self, layers, x, y):
+        names = [os.path.join(self.input_dir, layer,
+                              self.naming_scheme.format(x=x, y=y, z=self.base_level))
+                 for layer in layers]
+        image = overlay(names)
+        outname = tile_name(self.output_dir, x, y, self.base_level)
+        if len(names) == 1 and os.path.splitext(names[0])[1] == os.path.splitext(outname)[1]:
+            # nothing to overlay, the file is linked instead of encoded again
+            self.writer.copy(names[0], outname)
+        else:
+            self.store(image, x, y, self.base_level)
+        return as_rgba(image)
+
+    def __call__(self, task):
+        """
+        builds the subtree of tile (x, y, z): the overlaid base level tiles
+        are placed into a single array covering the subtree, which is then
+        reduced level by level in memory (see `reduce_block`)
+        """
+        (x, y, z), (names, tiles, membership) = task
+        levels = self.base_level - z
+        offsets = tiles - [x << levels, y << levels]
+        # non-empty tiles of the block for each depth, rows correspond to y
+        present = [np.zeros((1 << levels, 1 << levels), dtype=bool)]
+        present[0][offsets[:, 1], offsets[:, 0]] = True
+        for depth in range(1, levels + 1):
+            n = 1 << (levels - depth)
+            present.append(present[-1].reshape(n, 2, n, 2).any(axis=(1, 3)))
+        block = None
+        for (bx, by), (lx, ly), member in zip(offsets.tolist(), tiles.tolist(), membership):
+            image = self.leaf(list(compress(names, member)), lx, ly)
+            tilesize = len(image)
+            if block is None:
+                block = np.zeros((tilesize << levels, tilesize << levels, 4), dtype="uint8")
+            block[by * tilesize:(by + 1) * tilesize, bx * tilesize:(bx + 1) * tilesize] = image
+
+        def needed(bx, by, depth):
+            return present[depth][by, bx]
+
+        for depth, block in reduce_block(block, levels, self.resampling, needed, tilesize):
+            shift = levels - depth
+            for by, bx in zip(*np.nonzero(present[depth])):
+                self.store(block[by * tilesize:(by + 1) * tilesize, bx * tilesize:(bx + 1) * tilesize],
+                           (x << shift) + int(bx), (y << shift) + int(by), self.base_level - depth)
+        return (x, y), block
+
+
+def build_pyramid(input_dir, base_level, output_dir,
+                  workers=None, block_levels=4, show_progress=False, encoder=None,
+                  dedup=None, resampling="box", naming_scheme=DEFAULT_NAMING_SCHEME):
+    """
+    overlays tiles of multiple layers and builds the image pyramid in-process
+
+    :param input_dir: folder containing one folder (tileset) per layer
+    :param base_level: level in which input tiles have been generated
+    :param output_dir: folder for generated output tiles
+    :param workers: number of worker processes, `None` builds all tiles in
+                    the current process
+    :param block_levels: each worker task builds a subtree spanning up to
+                         2**block_levels x 2**block_levels base level tiles,
+                         which are reduced as a single array in memory
+                         (16 MB per 1024 x 1024 pixels), only the levels
+                         above are built tile by tile
+    :param encoder: `TileEncoder` configuring the encoding of output tiles
+    :param dedup: deduplicate identical output tiles, "uniform" or "all"
+                  (see `TileWriter`)
+    :param resampling: downsampling filter, "box", "lanczos", "mode" or
+                       "nearest" (see `downsample`)
+    :param naming_scheme: naming scheme of the input tiles (see `LLTiler`),
+                          output tiles are named "{z}/{x}/{y}.png"
+
+    :note: this is equivalent to running the makefile generated by
+           `generate_tile_makefile`, but decoded tiles are passed between
+           levels in memory
+    """
+    if show_progress:
+        from tqdm import tqdm
+        progress = tqdm
+    else:
+        def progress(x, total):
+            return x
+
+    names, tiles, membership = find_layer_tiles(input_dir, base_level, naming_scheme)
+    split_level = max(base_level - block_levels, 0)
+    shift = base_level - split_level
+
+    # one task per subtree, tiles are grouped on the keys of their roots
+    keys, inverse = np.unique(tile_keys(tiles >> shift), return_inverse=True)
+    groups = np.split(np.argsort(inverse, kind="stable"), np.cumsum(np.bincount(inverse))[:-1])
+    tasks = [((x, y, split_level), (names, tiles[group], membership[group]))
+             for (x, y), group in zip(keys_to_tiles(keys).tolist(), groups)]
+
+    builder = _SubtreeBuilder(input_dir, output_dir, base_level, encoder, dedup,
+                              resampling, naming_scheme)
+    roots = dict(progress(_imap(builder, tasks, workers, ordered=False),
+                          total=len(tasks)))
+
+    if roots:
+        present = present_tiles(roots, split_level, 0)
+        reduce_tiles(0, 0, 0, split_level, present,
+                     lambda x, y: roots[(x, y)], builder.store, resampling)
@@ -0,0 +1,84 @@
+import numpy as np
+
+
+def _cell_edges(centers):
+    centers = np.asarray(centers, dtype="float")
+    mid = (centers[1:] + centers[:-1]) / 2
+    first = 2 * centers[0] - mid[0]
+    last = 2 * centers[-1] - mid[-1]
+    return np.concatenate([[first], mid, [last]])
+
+
+class _Axis:
+    """
+    nearest neighbour lookup on a 1D coordinate axis
+    """
+    def __init__(self, centers):
+        centers = np.asarray(centers, dtype="float")
+        if centers.ndim != 1 or len(centers) < 2:
+            raise ValueError("coordinate axes must be 1D with at least two entries")
+        self.size = len(centers)
+        self.descending = centers[0] > centers[-1]
+        if self.descending:
+            centers = centers[::-1]
+        self.edges = _cell_edges(centers)
+
+    def indices(self, values):
+        """
+        :returns: (indices, valid) where invalid indices are set to 0
+        """
+        idx = np.searchsorted(self.edges, values, side="right") - 1
+        valid = (idx >= 0) & (idx < self.size)
+        if self.descending:
+            idx = self.size - 1 - idx
+        return np.where(valid, idx, 0), valid
+
+
+class RectilinearGrid:
+    def __init__(self, data, lat, lon, colorize=None):
+        """
+        Separable tile callback for data on a rectilinear lat/lon grid.
+
+        Tiles are filled by nearest neighbour lookup: the tile axes are
+        converted to index arrays once per call and the data is gathered
+        using a single vectorized indexing operation. Pixels outside of
+        the grid are fully transparent.
+
+        :param data: array of shape (lat, lon) or (lat, lon, 4),
+                     in the latter case, values must be RGBA (uint8)
+        :param lat: latitudes of the grid cell centers (1D, monotonic)
+        :param lon: longitudes of the grid cell centers (1D, monotonic),
+                    may either be in the range -180...180 or 0...360
+        :param colorize: function converting gathered data values to RGBA,
+                         required if `data` is not RGBA
+
+        :note: use with `LLTiler.render(..., separable=True)`
+        """
+        self.data = np.asarray(data)
+        if self.data.ndim == 2 and colorize is None:
+            raise ValueError("colorize must be given for scalar data")
+        if self.data.shape[:2] != (len(lat), len(lon)):
+            raise ValueError("data shape does not match coordinate axes")
+        self.lat = _Axis(lat)
+        self.lon = _Axis(lon)
+        self.wrap_lon = np.max(lon) > 180.
+        self.colorize = colorize
+
+    def __call__(self, lat, lon):
+        """
+        :param lat: latitude axis of shape (..., N)
+        :param lon: longitude axis of shape (..., M)
+        :returns: RGBA values of shape (..., N, M, 4)
+        """
+        if self.wrap_lon:
+            lon = np.mod(lon, 360.)
+        ilat, vlat = self.lat.indices(lat)
+        ilon, vlon = self.lon.indices(lon)
+        values = self.data[ilat[..., :, np.newaxis], ilon[..., np.newaxis, :]]
+        if self.colorize is None:
+            colors = values
+        else:
+            colors = np.asarray(self.colorize(values), dtype="uint8")
+        valid = vlat[..., :, np.newaxis] & vlon[..., np.newaxis, :]
+        colors[..., -1] *= valid
+        return colors
@@ -0,0 +1,57 @@
+def _main():
+    import argparse
+    from lltiler.pyramid import build_pyramid
+    from lltiler.encoding import add_encoder_arguments, encoder_from_args
+    from lltiler.downsample import RESAMPLING
+    from lltiler.inventory import DEFAULT_NAMING_SCHEME
+
+    parser = argparse.ArgumentParser(
+            description="overlay tilesets and generate the image pyramid in-process")
+    parser.add_argument("base_level",
+                        type=int,
+                        help="level in which input tiles have been generated")
+    parser.add_argument("base_dir",
+                        type=str,
+                        help="folder containing input tiles")
+    parser.add_argument("out_dir",
+                        type=str,
+                        help="folder for generated output tiles")
+    parser.add_argument("-j", "--workers",
+                        type=int,
+                        default=None,
+                        help="number of worker processes")
+    parser.add_argument("--block-levels",
+                        type=int,
+                        default=4,
+                        help="number of levels built by a single worker task")
+    parser.add_argument("--progress",
+                        action="store_true",
+                        help="show progress (requires tqdm)")
+    parser.add_argument("--dedup",
+                        choices=["uniform", "all"],
+                        default=None,
+                        help="store identical tiles only once and hard link them, "
+                             "either only single colored tiles or all tiles")
+    parser.add_argument("--naming-scheme",
+                        type=str,
+                        default=DEFAULT_NAMING_SCHEME,
+                        help="naming scheme of the input tiles (default: {z}/{x}/{y}.png)")
+    parser.add_argument("--resampling",
+                        choices=RESAMPLING,
+                        default="box",
+                        help="downsampling filter, mode or nearest for categorical data")
+    add_encoder_arguments(parser)
+    args = parser.parse_args()
+
+    build_pyramid(args.base_dir, args.base_level, args.out_dir,
+                  workers=args.workers,
+                  block_levels=args.block_levels,
+                  show_progress=args.progress,
+                  encoder=encoder_from_args(args),
+                  dedup=args.dedup,
+                  resampling=args.resampling,
+                  naming_scheme=args.naming_scheme)
+
+
+if __name__ == '__main__':
+    _main()
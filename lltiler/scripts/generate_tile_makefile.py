@@ -1,17 +1,14 @@
 import os
-from collections import defaultdict
+from itertools import compress
+
+from lltiler.inventory import DEFAULT_NAMING_SCHEME, scan_layers, scan_tiles, layers_by_tile
 
 
 def find_tiles(tiledir):
-    for xdir in os.listdir(tiledir):
-        try:
-            x = int(xdir)
-        except ValueError:
-            continue
-        for filename in os.listdir(os.path.join(tiledir, xdir)):
-            base, ext = os.path.splitext(filename)
-            y = int(base)
-            yield (x, y)
+    """
+    lists the tiles in a level folder (`{x}/{y}.png`) as (x, y) tuples
+    """
+    return map(tuple, scan_tiles(tiledir, None, "{x}/{y}.png").tolist())
 
 
 def make_pyramides(basedir, level, tiles):
@@ -39,6 +36,20 @@ def make_pyramides(basedir, level, tiles):
     make_pyramides(basedir, level-1, next_tiles)
 
 
+def make_overlays(names, tiles, membership, outname, inname):
+    for (x, y), member in zip(tiles.tolist(), membership):
+        layers = list(compress(names, member))
+        innames = [inname(layer, x, y) for layer in layers]
+        print(outname(x, y) + ": " + " ".join(innames))
+        if len(layers) == 1 and os.path.splitext(innames[0])[1] == os.path.splitext(outname(x, y))[1]:
+            # nothing to overlay, the tile is linked (or copied) as is, via a
+            # temporary file such that interrupted copies are not taken as done
+            print("\tmkdir -p $(@D) && (${LINK_TILE} $< $@.tmp 2>/dev/null || cp $< $@.tmp) && mv -f $@.tmp $@")
+        else:
+            print("\t${OVERLAY_TILES} $@ $^")
+        print()
+
+
 def _main(from_setuptools_script=True):
     import sys
     if from_setuptools_script:
@@ -54,6 +65,9 @@ def _main(from_setuptools_script=True):
                 os.path.join(script_base_dir, "overlay_tiles.py"))
 
     import argparse
+    from lltiler.encoding import (add_encoder_arguments, encoder_from_args,
+                                  encoder_arguments)
+    from lltiler.downsample import RESAMPLING
     parser = argparse.ArgumentParser()
     parser.add_argument("base_level",
                         type=int,
@@ -64,16 +78,30 @@ def _main(from_setuptools_script=True):
     parser.add_argument("out_dir",
                         type=str,
                         help="folder for generated output tiles")
+    parser.add_argument("--naming-scheme",
+                        type=str,
+                        default=DEFAULT_NAMING_SCHEME,
+                        help="naming scheme of the input tiles (default: {z}/{x}/{y}.png)")
+    parser.add_argument("--resampling",
+                        choices=RESAMPLING,
+                        default="box",
+                        help="downsampling filter, mode or nearest for categorical data")
+    add_encoder_arguments(parser)
     args = parser.parse_args()
 
+    if args.resampling != "box":
+        pyramid_step += " --resampling " + args.resampling
+
+    encoder_options = " ".join(encoder_arguments(encoder_from_args(args)))
+    if encoder_options:
+        pyramid_step += " " + encoder_options
+        overlay_tiles += " " + encoder_options
+
     base_level = args.base_level
     basedir = args.base_dir
     outdir = args.out_dir
-    layers = sorted(os.listdir(basedir))
-    layers_by_tile = defaultdict(list)
-    for layer in layers:
-        for tile in find_tiles(os.path.join(basedir, layer, str(base_level))):
-            layers_by_tile[tile].append(layer)
+    naming_scheme = args.naming_scheme
+    names, tiles, membership = layers_by_tile(scan_layers(basedir, base_level, naming_scheme))
 
     def outname(x, y):
         return os.path.join(outdir,
@@ -81,24 +109,17 @@ def _main(from_setuptools_script=True):
 
     def inname(layer, x, y):
         return os.path.join(basedir, layer,
-                            str(base_level), str(x), str(y) + ".png")
-
-    yvals_by_x = defaultdict(list)
-    for x, y in layers_by_tile.keys():
-        yvals_by_x[x].append(y)
+                            naming_scheme.format(x=x, y=y, z=base_level))
 
     print("PYRAMID_STEP={}".format(pyramid_step))
     print("OVERLAY_TILES={}".format(overlay_tiles))
+    print("LINK_TILE=ln -f")
     print()
     print("all: " + os.path.join(outdir, "0", "0", "0.png"))
     print(".PHONY: all")
     print()
-    make_pyramides(outdir, base_level, layers_by_tile.keys())
-    for (x, y), layers in sorted(layers_by_tile.items()):
-        print(outname(x, y) + ": " + (" ".join(inname(layer, x, y)
-                                               for layer in sorted(layers))))
-        print("\t${OVERLAY_TILES} $@ $^")
-        print()
+    make_pyramides(outdir, base_level, map(tuple, tiles.tolist()))
+    make_overlays(names, tiles, membership, outname, inname)
 
 
 if __name__ == '__main__':
@@ -1,29 +1,32 @@
-from PIL import Image
+import os
 
-
-def overlay(images):
-    if len(images) == 1:
-        return images[0]
-    new_image = Image.new("RGBA", images[0].size, (0, 0, 0, 0))
-    for image in images:
-        new_image.paste(image, None, image)
-    return new_image
+from lltiler.compositing import overlay
 
 
 def _main():
-    import os
-    import sys
-    outfile = sys.argv[1]
-    infiles = sys.argv[2:]
-    outdir = os.path.dirname(outfile)
-    if not os.path.exists(outdir):
-        try:
-            os.makedirs(outdir)
-        except OSError:
-            # catch race condition, if folder is created in between both calls
-            pass
-    new_im = overlay(list(map(Image.open, infiles)))
-    new_im.save(outfile)
+    import argparse
+    from lltiler.encoding import add_encoder_arguments, encoder_from_args
+    from lltiler.tilewriter import TileWriter
+
+    parser = argparse.ArgumentParser(
+            description="paint multiple tiles on top of each other")
+    parser.add_argument("outfile",
+                        type=str,
+                        help="output tile")
+    parser.add_argument("infiles",
+                        type=str,
+                        nargs="+",
+                        help="input tiles, from bottom to top")
+    add_encoder_arguments(parser)
+    args = parser.parse_args()
+
+    writer = TileWriter(encoder=encoder_from_args(args))
+    infiles = args.infiles
+    if len(infiles) == 1 and os.path.splitext(infiles[0])[1] == os.path.splitext(args.outfile)[1]:
+        # nothing to combine, the tile is stored as is
+        writer.copy(infiles[0], args.outfile)
+    else:
+        writer.write(overlay(infiles), args.outfile)
 
 
 if __name__ == '__main__':
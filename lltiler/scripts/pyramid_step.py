@@ -1,43 +1,39 @@
 from PIL import Image
 
-TILE_SIZE = 256
-
-
-def combine(tl, bl, tr, br):
-    new_image = Image.new("RGBA", (2*TILE_SIZE, 2*TILE_SIZE), (0, 0, 0, 0))
-    for xofs, yofs, subtile in [(0, 0, tl),
-                                (1, 0, tr),
-                                (0, 1, bl),
-                                (1, 1, br)]:
-        new_image.paste(subtile,
-                        box=(xofs*TILE_SIZE, yofs*TILE_SIZE,
-                             (xofs+1)*TILE_SIZE, (yofs+1)*TILE_SIZE))
-    new_image.thumbnail((TILE_SIZE, TILE_SIZE), Image.LANCZOS)
-    return new_image
+from lltiler.downsample import RESAMPLING, combine
 
 
 def load_file(path):
     if path == "-":
-        return Image.new("RGBA", (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0))
+        return None
     else:
         return Image.open(path)
 
 
 def _main():
-    import os
-    import sys
-    outfile = sys.argv[1]
-    infiles = sys.argv[2:]
-    assert len(infiles) == 4
-    outdir = os.path.dirname(outfile)
-    if not os.path.exists(outdir):
-        try:
-            os.makedirs(outdir)
-        except OSError:
-            # catch race condition, if folder is created in between both calls
-            pass
-    outimage = combine(*map(load_file, infiles))
-    outimage.save(outfile)
+    import argparse
+    from lltiler.encoding import add_encoder_arguments, encoder_from_args
+    from lltiler.tilewriter import TileWriter
+
+    parser = argparse.ArgumentParser(
+            description="combine four adjacent tiles into a tile of half resolution")
+    parser.add_argument("outfile",
+                        type=str,
+                        help="output tile")
+    parser.add_argument("infiles",
+                        type=str,
+                        nargs=4,
+                        help="top left, bottom left, top right and bottom right "
+                             "input tiles, missing tiles are denoted by -")
+    parser.add_argument("--resampling",
+                        choices=RESAMPLING,
+                        default="box",
+                        help="downsampling filter, mode or nearest for categorical data")
+    add_encoder_arguments(parser)
+    args = parser.parse_args()
+
+    outimage = combine(*map(load_file, args.infiles), resampling=args.resampling)
+    TileWriter(encoder=encoder_from_args(args)).write(outimage, args.outfile)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,163 @@
+import os
+import time
+import socket
+import sqlite3
+import threading
+import contextlib
+
+from .lltiler import TileSelector
+
+PENDING = 0
+LEASED = 1
+DONE = 2
+
+
+class QueueTileSelector(TileSelector):
+    def __init__(self, path, lease_size=16, lease_time=600., max_attempts=3,
+                 prefetch=None, poll_interval=None):
+        """
+        Selects tiles dynamically from a task queue shared between processes.
+
+        All tiles are stored in a SQLite database at `path`, rendering
+        processes (possibly on different nodes) lease batches of tiles from
+        the queue until all tiles are done. Leases of tiles which have not
+        been completed within `lease_time` seconds (e.g. because the
+        process died) expire and the tiles are handed out again.
+
+        :param path: path of the queue database, all processes rendering
+                     the same tileset must use the same path
+        :param lease_size: number of tiles leased at once
+        :param lease_time: seconds after which a lease expires, must be
+                           larger than the time needed to render a lease
+        :param max_attempts: tiles are not leased again after this many
+                             expired leases
+        :param prefetch: maximum number of leased but not yet completed tiles
+                         when rendering with `workers` (default:
+                         4 * lease_size)
+        :param poll_interval: seconds to wait before checking for expired
+                              leases again if all remaining tiles are leased
+                              by other processes, the selection ends as
+                              soon as only tiles leased by this process
+                              remain
+
+        :note: the queue relies on SQLite file locking, which may not work
+               reliably on network file systems
+        """
+        self.path = path
+        self.lease_size = lease_size
+        self.lease_time = lease_time
+        self.max_attempts = max_attempts
+        self.prefetch = prefetch or 4 * lease_size
+        self.poll_interval = poll_interval or min(lease_time / 10., 10.)
+        self.owner = "{}:{}".format(socket.gethostname(), os.getpid())
+        self._remaining = None
+        self._outstanding = 0
+        self._condition = threading.Condition()
+        self._render_thread = None
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        connection = sqlite3.connect(self.path, timeout=60., isolation_level=None)
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def fill(self, tiles):
+        """
+        adds tiles to the queue, tiles which are already queued are ignored
+
+        :returns: number of tiles which are not yet done
+        """
+        with self._transaction() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS tiles ("
+                               "x INTEGER, y INTEGER, "
+                               "state INTEGER DEFAULT {}, "
+                               "owner TEXT, lease_until REAL, "
+                               "attempts INTEGER DEFAULT 0, "
+                               "PRIMARY KEY (x, y))".format(PENDING))
+            connection.execute("CREATE INDEX IF NOT EXISTS tiles_state ON tiles (state)")
+            connection.executemany("INSERT OR IGNORE INTO tiles (x, y) VALUES (?, ?)",
+                                   ((int(x), int(y)) for x, y in tiles))
+            return connection.execute("SELECT COUNT(*) FROM tiles WHERE state != ?",
+                                      (DONE,)).fetchone()[0]
+
+    def lease(self):
+        """
+        leases up to `lease_size` tiles
+
+        :returns: list of leased (x, y) tiles
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            tiles = connection.execute(
+                    "SELECT x, y FROM tiles WHERE state = ? OR "
+                    "(state = ? AND lease_until < ? AND attempts < ?) LIMIT ?",
+                    (PENDING, LEASED, now, self.max_attempts, self.lease_size)).fetchall()
+            connection.executemany(
+                    "UPDATE tiles SET state = ?, owner = ?, lease_until = ?, "
+                    "attempts = attempts + 1 WHERE x = ? AND y = ?",
+                    [(LEASED, self.owner, now + self.lease_time, x, y) for x, y in tiles])
+        return tiles
+
+    def in_progress(self):
+        """
+        checks if tiles are leased by other processes which may still be
+        completed or retried
+
+        Tiles leased by this process are not waited for, these are completed
+        by `render` after the selected tiles have been consumed (e.g. once
+        the tiles queued for background writing have been written).
+        """
+        with self._transaction() as connection:
+            return connection.execute(
+                    "SELECT COUNT(*) FROM tiles WHERE state = ? AND owner != ? "
+                    "AND (lease_until >= ? OR attempts < ?)",
+                    (LEASED, self.owner, time.time(), self.max_attempts)).fetchone()[0] > 0
+
+    def completed(self, tiles):
+        with self._transaction() as connection:
+            connection.executemany("UPDATE tiles SET state = ? WHERE x = ? AND y = ?",
+                                   [(DONE, x, y) for x, y in tiles])
+        with self._condition:
+            self._outstanding -= len(tiles)
+            self._condition.notify_all()
+
+    def len(self, total):
+        """
+        :note: only available after `select`, returns the number of tiles
+               which are not yet done (by any process)
+        """
+        return self._remaining
+
+    def select(self, tilegen):
+        self._remaining = self.fill(tilegen)
+        self._render_thread = threading.get_ident()
+        return self._leased_tiles()
+
+    def _wait_for_capacity(self):
+        if threading.get_ident() == self._render_thread:
+            # tiles are rendered in this thread, waiting would block forever
+            return
+        with self._condition:
+            while self._outstanding >= self.prefetch:
+                self._condition.wait()
+
+    def _leased_tiles(self):
+        while True:
+            self._wait_for_capacity()
+            tiles = self.lease()
+            if tiles:
+                with self._condition:
+                    self._outstanding += len(tiles)
+                yield from tiles
+            elif self.in_progress():
+                time.sleep(self.poll_interval)
+            else:
+                return
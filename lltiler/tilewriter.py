@@ -0,0 +1,344 @@
+import os
+import errno
+import shutil
+import hashlib
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from .encoding import TileEncoder, image_format
+
+DEDUP_MODES = ("uniform", "all")
+LINK_MODES = ("hardlink", "symlink")
+
+
+class TileWriter:
+    def __init__(self, fsync=False, create_folders=True, encoder=None,
+                 dedup=None, dedup_folder=None, link="hardlink"):
+        """
+        Writes tiles atomically.
+
+        Each tile is written to a temporary file in the destination folder
+        first and renamed afterwards, such that readers never see partially
+        written tiles. Folders which have been created already are
+        remembered, so `os.makedirs` is called only once per folder.
+
+        :param fsync: if True, tiles (and the folder entries) are flushed to
+                      disk before `write` returns
+        :param create_folders: if False, destination folders are assumed to
+                               exist already (e.g. created by `makedirs`)
+        :param encoder: `TileEncoder` with the encoding options
+        :param dedup: if given, identical tiles are encoded only once and
+                      stored in `dedup_folder`, the tiles themselves are
+                      links to these files. "uniform" only deduplicates
+                      tiles consisting of a single color (e.g. solid
+                      ocean), which is cheap to detect, "all" deduplicates
+                      all tiles based on a hash of their pixels
+        :param dedup_folder: content addressed store for deduplicated
+                             tiles, must be on the same file system as the
+                             tiles for hard links
+        :param link: "hardlink" or "symlink" (relative symbolic links)
+
+        :note: deduplicated tiles share their file, they must only be
+               replaced (as done by `write`) and never modified in place
+        """
+        if dedup is not None and dedup not in DEDUP_MODES:
+            raise ValueError("dedup must be one of {}".format(", ".join(DEDUP_MODES)))
+        if dedup is not None and dedup_folder is None:
+            raise ValueError("dedup requires a dedup_folder")
+        if link not in LINK_MODES:
+            raise ValueError("link must be one of {}".format(", ".join(LINK_MODES)))
+        self.fsync = fsync
+        self.create_folders = create_folders
+        self.encoder = encoder or TileEncoder()
+        self.dedup = dedup
+        self.dedup_folder = dedup_folder
+        self.link = link
+        self._folders = set()
+        self._stored = {}
+        self._store_lock = threading.Lock()
+
+    def __getstate__(self):
+        # the folder and dedup caches are rebuilt on demand, it is not worth
+        # transferring them to other processes
+        state = self.__dict__.copy()
+        state["_folders"] = set()
+        state["_stored"] = {}
+        del state["_store_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._store_lock = threading.Lock()
+
+    def makedirs(self, folder):
+        if folder and folder not in self._folders:
+            os.makedirs(folder, exist_ok=True)
+            self._folders.add(folder)
+
+    def write(self, image, filename):
+        """
+        :param image: PIL image or RGBA array
+        :param filename: destination, the format is derived from the extension
+        """
+        if self.dedup is not None:
+            key = self.content_key(image)
+            if key is not None:
+                self._write_shared(image, filename, key)
+                return
+        self._write_file(image, filename)
+
+    def content_key(self, image):
+        """
+        identifies the content of a tile for deduplication
+
+        :returns: relative path (without extension) of the tile in the
+                  dedup store, None if the tile should not be deduplicated
+        """
+        if isinstance(image, Image.Image) and image.mode != "RGBA":
+            image = image.convert("RGBA")
+        pixels = np.asarray(image)
+        size = "x".join(map(str, pixels.shape))
+        if pixels.ndim == 3 and (pixels == pixels[0, 0]).all():
+            return os.path.join("uniform", "{}-{}".format(pixels[0, 0].tobytes().hex(), size))
+        if self.dedup != "all":
+            return None
+        digest = hashlib.sha1(np.ascontiguousarray(pixels).data)
+        digest.update(size.encode())
+        digest = digest.hexdigest()
+        return os.path.join(digest[:2], digest)
+
+    def _write_shared(self, image, filename, key):
+        source = os.path.join(self.dedup_folder, key + os.path.splitext(filename)[1])
+        # the store is created here, even if the tile folders are created
+        # up front (create_folders=False)
+        self.makedirs(os.path.dirname(source))
+        self._store(image, source)
+        try:
+            self._link_file(source, filename)
+        except OSError as e:
+            if e.errno != errno.EMLINK:
+                raise
+            # the maximum number of hard links is reached, start a new copy
+            self._write_file(image, source)
+            self._link_file(source, filename)
+
+    def _store(self, image, source):
+        """
+        writes a shared tile to the store, unless it exists already
+
+        Each file is written by a single thread, other threads storing the
+        same tile wait until it has been written (and retry if that failed).
+        The lock is only held to claim a file, not while encoding it.
+        """
+        while True:
+            with self._store_lock:
+                written = self._stored.get(source)
+                if written is None:
+                    written = self._stored[source] = threading.Event()
+                    break
+            written.wait()
+            if self._stored.get(source) is written:
+                return
+        try:
+            if not os.path.exists(source):
+                self._write_file(image, source)
+        except BaseException:
+            with self._store_lock:
+                del self._stored[source]
+            raise
+        finally:
+            written.set()
+
+    def copy(self, source, filename):
+        """
+        stores an existing tile file without decoding and encoding it again,
+        `filename` becomes a hard link to `source` if possible, otherwise
+        a copy
+        """
+        def create(tmpname):
+            try:
+                os.link(source, tmpname)
+            except OSError:
+                shutil.copyfile(source, tmpname)
+                if self.fsync:
+                    with open(tmpname, "rb+") as tmpfile:
+                        os.fsync(tmpfile.fileno())
+        self._replace(filename, create)
+
+    def _link_file(self, source, filename):
+        folder = os.path.dirname(filename)
+
+        def create(tmpname):
+            if self.link == "symlink":
+                os.symlink(os.path.relpath(source, folder or "."), tmpname)
+            else:
+                os.link(source, tmpname)
+        self._replace(filename, create)
+
+    def _write_file(self, image, filename):
+        if not isinstance(image, Image.Image):
+            image = Image.fromarray(image)
+
+        def create(tmpname):
+            with open(tmpname, "wb") as tmpfile:
+                self.encoder.save(image, tmpfile, image_format(filename))
+                if self.fsync:
+                    tmpfile.flush()
+                    os.fsync(tmpfile.fileno())
+        self._replace(filename, create)
+
+    def _replace(self, filename, create):
+        """
+        calls `create` with a temporary name in the destination folder and
+        renames the created file to `filename`
+        """
+        folder, basename = os.path.split(filename)
+        if self.create_folders:
+            self.makedirs(folder)
+        # several threads may write the same file (e.g. a shared tile in the
+        # dedup store), so the temporary name is unique per thread
+        tmpname = os.path.join(folder, ".tmp-{}-{}-{}".format(
+            os.getpid(), threading.get_ident(), basename))
+        try:
+            create(tmpname)
+            os.replace(tmpname, filename)
+        except BaseException:
+            try:
+                os.remove(tmpname)
+            except OSError:
+                pass
+            raise
+        if self.fsync:
+            self._sync_folder(folder)
+
+    def mark(self):
+        """
+        :returns: a marker for all tiles written so far (see `done`)
+        """
+        return 0
+
+    def done(self, mark):
+        """
+        checks if all tiles written before `mark` have been stored
+        """
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def _sync_folder(self, folder):
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(folder or ".", os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class AsyncTileWriter:
+    def __init__(self, writer=None, threads=2, max_pending=None):
+        """
+        Writes tiles in background threads.
+
+        Tiles are encoded and written by `threads` background threads, such
+        that rendering can continue meanwhile. At most `max_pending` tiles
+        are queued, further calls to `write` block until a tile has been
+        written. Errors which occurred in the background are raised by the
+        next call to `write`, `done`, `flush` or `close`.
+
+        :param writer: `TileWriter` used to write the tiles
+        :param threads: number of background threads
+        :param max_pending: maximum number of queued tiles
+                            (default: 4 * threads)
+        """
+        self.writer = writer or TileWriter()
+        self.threads = threads
+        self.max_pending = max_pending or 4 * threads
+        self._reset()
+
+    def _reset(self):
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._condition = threading.Condition()
+        self._submitted = 0
+        self._completed = 0
+        self._finished = set()
+        self._error = None
+
+    def __getstate__(self):
+        return {"writer": self.writer,
+                "threads": self.threads,
+                "max_pending": self.max_pending}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+
+    def write(self, image, filename):
+        """
+        queues a tile for writing (see `TileWriter.write`)
+
+        The tile is copied, such that the caller may reuse its buffer.
+        """
+        self._check()
+        image = image.copy()
+        self._slots.acquire()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.threads)
+        with self._condition:
+            seq = self._submitted
+            self._submitted += 1
+        future = self._executor.submit(self.writer.write, image, filename)
+        future.add_done_callback(functools.partial(self._finish, seq))
+
+    def _finish(self, seq, future):
+        with self._condition:
+            if future.exception() is not None and self._error is None:
+                self._error = future.exception()
+            self._finished.add(seq)
+            while self._completed in self._finished:
+                self._finished.remove(self._completed)
+                self._completed += 1
+            self._condition.notify_all()
+        self._slots.release()
+
+    def mark(self):
+        with self._condition:
+            return self._submitted
+
+    def done(self, mark):
+        self._check()
+        with self._condition:
+            return self._completed >= mark
+
+    def flush(self):
+        """
+        waits until all queued tiles have been written
+        """
+        with self._condition:
+            while self._completed < self._submitted:
+                self._condition.wait()
+        self._check()
+
+    def close(self):
+        """
+        waits for all queued tiles and stops the background threads
+        """
+        try:
+            self.flush()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -0,0 +1,72 @@
+import numpy as np
+
+
+def _spread_bits(v):
+    v = np.asarray(v).astype("uint64")
+    v = (v | (v << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x3333333333333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return v
+
+
+def linear_key(x, y, z):
+    """
+    x-major order, as generated by `itertools.product(xs, ys)`
+    """
+    return (np.asarray(x).astype("uint64") << np.uint64(z)) | np.asarray(y).astype("uint64")
+
+
+def morton_key(x, y, z):
+    """
+    Z-order (Morton order), all tiles of a quadtree subtree are consecutive
+    """
+    return _spread_bits(x) | (_spread_bits(y) << np.uint64(1))
+
+
+def hilbert_key(x, y, z):
+    """
+    Hilbert curve order, all tiles of a quadtree subtree are consecutive and
+    consecutive tiles are always neighbours
+    """
+    n = 2**z
+    x = np.array(x, dtype="int64")
+    y = np.array(y, dtype="int64")
+    d = np.zeros(np.broadcast(x, y).shape, dtype="uint64")
+    s = n // 2
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += np.uint64(s * s) * ((3 * rx) ^ ry).astype("uint64")
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        s //= 2
+    return d
+
+
+ORDERS = {
+    "linear": linear_key,
+    "zorder": morton_key,
+    "hilbert": hilbert_key,
+}
+
+
+def sort_tiles(tiles, order, z):
+    """
+    sorts tiles according to a traversal order
+
+    :param tiles: iterable of (x, y) tile indices in level `z`
+    :param order: one of "linear", "zorder" or "hilbert"
+    :returns: list of (x, y) tile indices
+    """
+    try:
+        key = ORDERS[order]
+    except KeyError:
+        raise ValueError("unknown traversal order {!r}, must be one of {}".format(
+            order, ", ".join(sorted(ORDERS))))
+    tiles = np.array(list(tiles), dtype="int64").reshape(-1, 2)
+    keys = key(tiles[:, 0], tiles[:, 1], z)
+    return [tuple(t) for t in tiles[np.argsort(keys, kind="stable")].tolist()]
@@ -32,7 +32,8 @@ setuptools.setup(
             "{0} = lltiler.scripts.{0}:_main".format(script)
             for script in ["overlay_tiles",
                            "pyramid_step",
-                           "generate_tile_makefile"]
+                           "generate_tile_makefile",
+                           "build_pyramid"]
         ],
     },
     cmdclass=versioneer.get_cmdclass(),
@@ -0,0 +1,23 @@
+import numpy as np
+
+from lltiler import LLTiler, QueueTileSelector
+
+
+def test_queue_with_writer_threads(tmp_path):
+    calls = []
+
+    def callback(lat, lon):
+        calls.append(1)
+        out = np.zeros(lat.shape + (4,), dtype="uint8")
+        out[..., 3] = 255
+        return out
+
+    selector = QueueTileSelector(str(tmp_path / "queue.db"), lease_size=4, lease_time=2.)
+    tiler = LLTiler(str(tmp_path / "tiles"), base_level=8)
+    tiler.render(((45., 9.), (47., 16.)), callback, selector=selector, writer_threads=2)
+
+    x_range, y_range = tiler.tile_range(((45., 9.), (47., 16.)))
+    # tiles leased by the render thread itself are not waited for until
+    # their leases expire (and they are rendered again)
+    assert len(calls) == len(x_range) * len(y_range)
+    assert selector.fill([]) == 0
@@ -0,0 +1,89 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from lltiler import LLTiler
+from lltiler.tilewriter import AsyncTileWriter, TileWriter
+
+
+def solid(lat, lon):
+    out = np.zeros(np.broadcast(lat, lon).shape + (4,), dtype="uint8")
+    out[...] = (10, 0, 0, 255)
+    return out
+
+
+@pytest.mark.parametrize("options", [{"writer_threads": 4},
+                                     {"precreate_folders": True},
+                                     {"writer_threads": 4, "precreate_folders": True}])
+def test_dedup_uniform_tiles(tmp_path, options):
+    tiler = LLTiler(str(tmp_path), base_level=8, dedup="uniform")
+    tiler.render(((45., 9.), (47., 16.)), solid, **options)
+
+    x_range, y_range = tiler.tile_range(((45., 9.), (47., 16.)))
+    tiles = [tiler.tile_path(x, y, 8) for x in x_range for y in y_range]
+    assert len(tiles) >= 5
+    inodes = set(os.stat(tile).st_ino for tile in tiles)
+    assert len(inodes) == 1
+    assert np.all(tiler.load_tile(x_range[0], y_range[0], 8) == (10, 0, 0, 255))
+    for root, _, files in os.walk(str(tmp_path)):
+        assert not [name for name in files if name.startswith(".tmp-")]
+
+
+def test_async_writer_copies_tiles(tmp_path):
+    writer = AsyncTileWriter(TileWriter(), threads=2)
+    buffer = np.zeros((256, 256, 4), dtype="uint8")
+    for i in range(8):
+        buffer[...] = (i, 0, 0, 255)
+        writer.write(buffer, str(tmp_path / "{}.png".format(i)))
+    writer.close()
+    for i in range(8):
+        tile = np.asarray(Image.open(str(tmp_path / "{}.png".format(i))))
+        assert np.all(tile == (i, 0, 0, 255))
+
+
+def test_writer_threads_with_workers(tmp_path):
+    tiler = LLTiler(str(tmp_path), base_level=8)
+    with pytest.raises(ValueError):
+        tiler.render(((45., 9.), (47., 16.)), solid, workers=2, writer_threads=2)
+
+
+class CountingWriter(TileWriter):
+    def __init__(self, barrier=None, **kwargs):
+        super().__init__(**kwargs)
+        self.barrier = barrier
+        self.stored = []
+
+    def _write_file(self, image, filename):
+        if ".lltiler-dedup" in filename:
+            self.stored.append(filename)
+            if self.barrier is not None:
+                # fails if the tiles are not encoded in parallel
+                self.barrier.wait(timeout=10)
+        super()._write_file(image, filename)
+
+
+def test_dedup_store_encodes_in_parallel(tmp_path):
+    writer = CountingWriter(threading.Barrier(2), dedup="all",
+                            dedup_folder=str(tmp_path / ".lltiler-dedup"))
+    async_writer = AsyncTileWriter(writer, threads=2)
+    for i in range(2):
+        tile = np.zeros((256, 256, 4), dtype="uint8")
+        tile[0, 0] = (i, 0, 0, 255)
+        async_writer.write(tile, str(tmp_path / "{}.png".format(i)))
+    async_writer.close()
+    assert len(writer.stored) == 2
+
+
+def test_dedup_store_writes_shared_tile_once(tmp_path):
+    writer = CountingWriter(dedup="all", dedup_folder=str(tmp_path / ".lltiler-dedup"))
+    async_writer = AsyncTileWriter(writer, threads=4)
+    tile = np.zeros((256, 256, 4), dtype="uint8")
+    tile[0, 0] = (1, 0, 0, 255)
+    for i in range(16):
+        async_writer.write(tile, str(tmp_path / "{}.png".format(i)))
+    async_writer.close()
+    assert len(writer.stored) == 1
+    assert len(set(os.stat(str(tmp_path / "{}.png".format(i))).st_ino for i in range(16))) == 1